@@ -0,0 +1,70 @@
+"""Stand-in for the HR backend the role JSON files point at.
+
+Every path accepts GET/POST/PUT/DELETE: GETs return a list of generated rows,
+writes echo a ``detail`` message, and the onboarding endpoint answers the
+way main.py expects.
+
+    python benchmarks/fake_backend.py --port 9001 --latency-ms 50 --rows 25
+
+and start the app with BACKEND_BASE_URL=http://127.0.0.1:9001.
+"""
+import argparse
+import asyncio
+import random
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI()
+
+SETTINGS = {'ms': 50.0, 'jitter_ms': 20.0, 'rows': 25}
+
+LEAVE_TYPES = ['sick', 'personal', 'vacation', 'unpaid']
+STATUSES = ['pending', 'approved', 'rejected']
+
+
+async def delay():
+    seconds = max(0.0, SETTINGS['ms'] + random.uniform(-SETTINGS['jitter_ms'], SETTINGS['jitter_ms'])) / 1000
+    await asyncio.sleep(seconds)
+
+
+def rows(count):
+    return [{
+        'id': index + 1,
+        'employee_id': f"EMP{index % 50:03d}",
+        'leave_type': LEAVE_TYPES[index % len(LEAVE_TYPES)],
+        'start_date': f"2024-{index % 12 + 1:02d}-{index % 28 + 1:02d}",
+        'total_days': index % 5 + 1,
+        'status': STATUSES[index % len(STATUSES)],
+        'reason': 'Benchmark row',
+    } for index in range(count)]
+
+
+@app.api_route("/personal/employees", methods=["POST"])
+async def onboard(request: Request):
+    await request.body()
+    await delay()
+    return JSONResponse({'detail': 'Email Send Successfully'})
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+async def crud(path: str, request: Request):
+    await request.body()
+    await delay()
+    if request.method == 'GET':
+        return JSONResponse(rows(SETTINGS['rows']))
+    verb = {'POST': 'created', 'PUT': 'updated', 'DELETE': 'deleted'}[request.method]
+    return JSONResponse({'detail': f"Record {verb} successfully"})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9001)
+    parser.add_argument('--latency-ms', type=float, default=SETTINGS['ms'])
+    parser.add_argument('--jitter-ms', type=float, default=SETTINGS['jitter_ms'])
+    parser.add_argument('--rows', type=int, default=SETTINGS['rows'], help='rows returned by every GET')
+    args = parser.parse_args()
+    SETTINGS.update(ms=args.latency_ms, jitter_ms=args.jitter_ms, rows=args.rows)
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
@@ -0,0 +1,151 @@
+"""Stand-in for the Groq chat completions API.
+
+Answers the project, payload, combined and summary prompts from
+chatcode/prompt_builder.py with canned ``~~~{...}~~~`` replies after a
+configurable delay, so the chat pipeline can be load tested offline.
+
+    python benchmarks/fake_groq.py --port 9000 --latency-ms 300 --jitter-ms 100
+
+and start the app with GROQ_BASE_URL=http://127.0.0.1:9000 (any API key works).
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI()
+
+LATENCY = {'ms': 300.0, 'jitter_ms': 100.0, 'token_ms': 5.0}
+
+SUMMARY_TEXT = "Your request was completed successfully and the details you provided have been saved."
+
+WORD_RE = re.compile(r'\w+')
+
+
+def words(text):
+    return set(WORD_RE.findall(text.lower()))
+
+
+def split_prompt(messages):
+    system = next((m['content'] for m in messages if m['role'] == 'system'), '')
+    user = next((m['content'] for m in reversed(messages) if m['role'] == 'user'), '')
+    catalogue, _, query = user.rpartition('\n\nQuery: ')
+    return system, catalogue, query
+
+
+def pick_project(names, query):
+    # Best word overlap with the query, like a model that read the descriptions
+    query_words = words(query)
+    best = max(names, key=lambda name: len(words(name) & query_words), default=None)
+    if best is None or not words(best) & query_words:
+        return "None"
+    return best
+
+
+def fill_fields(fields, query):
+    # "monthnumber 5 yearnumber 2024" style queries fill the named fields
+    payload = {}
+    for field in fields:
+        match = re.search(rf'\b{re.escape(field)}\s*[:=]?\s*(\S+)', query, re.IGNORECASE)
+        payload[field] = match.group(1) if match else "None"
+    return payload
+
+
+def schema_fields(lines):
+    return [line.split(':', 1)[0] for line in lines if ':' in line and not line.startswith('#')]
+
+
+def answer(messages):
+    system, catalogue, query = split_prompt(messages)
+    lines = [line for line in catalogue.splitlines()[1:] if line.strip()]
+
+    if system.startswith('You extract the project name'):
+        names = [line.split(':', 1)[0] for line in lines]
+        return f'~~~{json.dumps({"project": pick_project(names, query)})}~~~'
+
+    if system.startswith('You fill payload values'):
+        return f'~~~{json.dumps({"payload": fill_fields(schema_fields(lines), query)})}~~~'
+
+    if system.startswith('You pick the project'):
+        sections = {}
+        current = None
+        for line in lines:
+            if line.startswith('## '):
+                current = line[3:].split(':', 1)[0]
+                sections[current] = []
+            elif current is not None and line != '(no fields)':
+                sections[current].append(line)
+        project = pick_project(list(sections), query)
+        payload = fill_fields(schema_fields(sections.get(project, [])), query)
+        return f'~~~{json.dumps({"project": project, "payload": payload})}~~~'
+
+    return SUMMARY_TEXT
+
+
+def usage(messages, content):
+    prompt_tokens = sum(len(m['content']) for m in messages) // 4
+    completion_tokens = max(1, len(content) // 4)
+    return {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens}
+
+
+async def delay():
+    seconds = max(0.0, LATENCY['ms'] + random.uniform(-LATENCY['jitter_ms'], LATENCY['jitter_ms'])) / 1000
+    await asyncio.sleep(seconds)
+
+
+def stream_chunks(completion_id, model, messages, content):
+    created = int(time.time())
+    for piece in re.findall(r'\S+\s*', content):
+        yield {'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+               'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]}
+    yield {'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+           'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+           'x_groq': {'id': completion_id, 'usage': usage(messages, content)}}
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    messages = body.get('messages', [])
+    model = body.get('model') or 'fake-model'
+    content = answer(messages)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    await delay()
+
+    if body.get('stream'):
+        async def events():
+            for chunk in stream_chunks(completion_id, model, messages, content):
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(LATENCY['token_ms'] / 1000)
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return JSONResponse({
+        'id': completion_id,
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+        'usage': usage(messages, content),
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--latency-ms', type=float, default=LATENCY['ms'])
+    parser.add_argument('--jitter-ms', type=float, default=LATENCY['jitter_ms'])
+    parser.add_argument('--token-ms', type=float, default=LATENCY['token_ms'],
+                        help='delay between streamed chunks')
+    args = parser.parse_args()
+    LATENCY.update(ms=args.latency_ms, jitter_ms=args.jitter_ms, token_ms=args.token_ms)
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
@@ -0,0 +1,243 @@
+"""Load generator for /ws/chat and /ws/onboard.
+
+Opens N concurrent chat sockets and M onboarding sockets, replays the
+scripted conversations in benchmarks/scenarios.json and reports turns/sec,
+turn latency, per-stage p50/p95/p99 (from the app's /metrics histograms)
+and event-loop lag.
+
+Typical offline run, each in its own terminal:
+
+    python benchmarks/fake_groq.py --latency-ms 300
+    python benchmarks/fake_backend.py --latency-ms 50
+    GROQ_BASE_URL=http://127.0.0.1:9000 GROQ_API_KEY=fake GROQ_MODEL=fake-model \\
+        BACKEND_BASE_URL=http://127.0.0.1:9001 python main.py
+    python benchmarks/loadgen.py --chat 50 --onboard 5 --duration 60
+"""
+import argparse
+import asyncio
+import json
+import math
+import re
+import statistics
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+import websockets
+
+SCENARIOS_PATH = Path(__file__).with_name('scenarios.json')
+
+# A server frame containing one of these ends the current turn: either the
+# app is waiting for the next message or the request is finished
+TURN_END_MARKERS = (
+    "Please provide", "Select \"All\"", "You have asked", "Glad to help", "navigate",
+    "Goodbye", "Sorry", "Too many", "An error occurred", "Error", "No fields provided",
+    "Missing value", "Invalid input", "There are no more rows", "Please enter 'Onboard'",
+    "Back end server error", "check not payload", "Bearer token is missing", "Unsupported HTTP method",
+    '"type":"busy"',
+)
+
+SAMPLE_RE = re.compile(r'^(?P<name>[a-zA-Z_:][\w:]*)(?:\{(?P<labels>[^}]*)\})?\s+(?P<value>\S+)$')
+LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+class Results:
+    def __init__(self):
+        self.turns = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.conversations = 0
+        self.loop_lag = []
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[index]
+
+
+def ends_turn(frame: str) -> bool:
+    return any(marker in frame for marker in TURN_END_MARKERS)
+
+
+async def run_turn(ws, message, frame, timeout):
+    await ws.send(json.dumps({**frame, 'message': message}))
+    while True:
+        reply = await asyncio.wait_for(ws.recv(), timeout)
+        if ends_turn(reply):
+            return reply
+
+
+async def chat_worker(index, args, conversations, results, deadline):
+    base = {'token': args.token, 'apikey': args.apikey, 'model': args.model,
+            'stream': args.stream, 'session_id': f"bench-{index}"}
+    position = index
+    while time.monotonic() < deadline:
+        try:
+            async with websockets.connect(f"{args.url}/ws/chat", max_size=None) as ws:
+                while time.monotonic() < deadline:
+                    conversation = conversations[position % len(conversations)]
+                    position += 1
+                    frame = {**base, 'role': conversation['role']}
+                    for message in conversation['messages']:
+                        started = time.perf_counter()
+                        await run_turn(ws, message, frame, args.turn_timeout)
+                        results.turns['chat'].append(time.perf_counter() - started)
+                    results.conversations += 1
+        except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as e:
+            results.errors[f"chat {type(e).__name__}"] += 1
+            await asyncio.sleep(0.5)
+
+
+async def onboard_worker(index, args, conversations, results, deadline):
+    position = index
+    while time.monotonic() < deadline:
+        conversation = conversations[position % len(conversations)]
+        position += 1
+        try:
+            # The app closes the onboarding socket after each run
+            async with websockets.connect(f"{args.url}/ws/onboard", max_size=None) as ws:
+                for message in conversation['messages']:
+                    started = time.perf_counter()
+                    await run_turn(ws, message, {}, args.turn_timeout)
+                    results.turns['onboard'].append(time.perf_counter() - started)
+            results.conversations += 1
+        except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as e:
+            results.errors[f"onboard {type(e).__name__}"] += 1
+            await asyncio.sleep(0.5)
+
+
+async def watch_loop_lag(results, deadline, interval=0.05):
+    # Lag of the generator itself; if this is high the numbers above are suspect
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        results.loop_lag.append(max(0.0, time.perf_counter() - started - interval))
+
+
+async def scrape_metrics(http_url):
+    try:
+        async with httpx.AsyncClient(timeout=10) as client:
+            response = await client.get(f"{http_url}/metrics")
+            response.raise_for_status()
+            return parse_metrics(response.text)
+    except httpx.HTTPError:
+        return {}
+
+
+def parse_metrics(text):
+    samples = {}
+    for line in text.splitlines():
+        match = SAMPLE_RE.match(line.strip())
+        if not match or line.startswith('#'):
+            continue
+        labels = tuple(sorted(LABEL_RE.findall(match.group('labels') or '')))
+        samples[(match.group('name'), labels)] = float(match.group('value'))
+    return samples
+
+
+def histogram_deltas(before, after, name, group_label):
+    # {group: [(le, count delta), ...]} for one histogram between two scrapes
+    groups = defaultdict(list)
+    for (sample, labels), value in after.items():
+        if sample != f"{name}_bucket":
+            continue
+        label_map = dict(labels)
+        le = float(label_map['le'].replace('+Inf', 'inf'))
+        group = label_map.get(group_label, '')
+        groups[group].append((le, value - before.get((sample, labels), 0.0)))
+    return {group: sorted(buckets) for group, buckets in groups.items()}
+
+
+def histogram_quantile(q, buckets):
+    # Same linear interpolation as Prometheus' histogram_quantile()
+    total = buckets[-1][1] if buckets else 0
+    if total <= 0:
+        return float('nan')
+    rank = q * total
+    previous_bound, previous_count = 0.0, 0.0
+    for bound, count in buckets:
+        if count >= rank:
+            if math.isinf(bound):
+                return previous_bound
+            if count == previous_count:
+                return bound
+            return previous_bound + (bound - previous_bound) * (rank - previous_count) / (count - previous_count)
+        previous_bound, previous_count = bound, count
+    return previous_bound
+
+
+def ms(seconds):
+    return 'n/a' if math.isnan(seconds) else f"{seconds * 1000:8.1f}"
+
+
+def report(args, results, elapsed, before, after):
+    total_turns = sum(len(values) for values in results.turns.values())
+    print(f"\n{args.chat} chat + {args.onboard} onboard sockets for {elapsed:.1f}s")
+    print(f"conversations: {results.conversations}  turns: {total_turns}  "
+          f"turns/sec: {total_turns / elapsed:.1f}")
+    for kind, errors in sorted(results.errors.items()):
+        print(f"errors ({kind}): {errors}")
+
+    print(f"\n{'turn latency':<28}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for kind, values in sorted(results.turns.items()):
+        print(f"{kind:<28}{len(values):>8}{ms(percentile(values, .5)):>10}"
+              f"{ms(percentile(values, .95)):>10}{ms(percentile(values, .99)):>10}")
+
+    stages = histogram_deltas(before, after, 'chat_stage_seconds', 'stage')
+    if stages:
+        print(f"\n{'server stage':<28}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for stage, buckets in sorted(stages.items()):
+            count = buckets[-1][1] if buckets else 0
+            if count <= 0:
+                continue
+            print(f"{stage:<28}{int(count):>8}{ms(histogram_quantile(.5, buckets)):>10}"
+                  f"{ms(histogram_quantile(.95, buckets)):>10}{ms(histogram_quantile(.99, buckets)):>10}")
+    else:
+        print("\nNo /metrics histograms scraped; per-stage timings unavailable")
+
+    server_lag = histogram_deltas(before, after, 'event_loop_lag_seconds', '').get('')
+    if server_lag and server_lag[-1][1] > 0:
+        print(f"\nserver event-loop lag  p50 {ms(histogram_quantile(.5, server_lag)).strip()} ms  "
+              f"p99 {ms(histogram_quantile(.99, server_lag)).strip()} ms")
+    if results.loop_lag:
+        print(f"load generator loop lag  p50 {ms(statistics.median(results.loop_lag)).strip()} ms  "
+              f"p99 {ms(percentile(results.loop_lag, .99)).strip()} ms  "
+              f"max {ms(max(results.loop_lag)).strip()} ms")
+
+
+async def main(args):
+    scenarios = json.loads(Path(args.scenarios).read_text())
+    http_url = args.url.replace('ws://', 'http://', 1).replace('wss://', 'https://', 1)
+    results = Results()
+
+    before = await scrape_metrics(http_url)
+    started = time.monotonic()
+    deadline = started + args.duration
+    tasks = [asyncio.create_task(watch_loop_lag(results, deadline))]
+    tasks += [asyncio.create_task(chat_worker(i, args, scenarios['chat'], results, deadline))
+              for i in range(args.chat)]
+    tasks += [asyncio.create_task(onboard_worker(i, args, scenarios['onboard'], results, deadline))
+              for i in range(args.onboard)]
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - started
+    after = await scrape_metrics(http_url)
+    report(args, results, elapsed, before, after)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='ws://127.0.0.1:8000', help='app base URL')
+    parser.add_argument('--chat', type=int, default=10, help='concurrent /ws/chat sockets')
+    parser.add_argument('--onboard', type=int, default=0, help='concurrent /ws/onboard sockets')
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run')
+    parser.add_argument('--scenarios', default=str(SCENARIOS_PATH))
+    parser.add_argument('--token', default='benchmark-token')
+    # The frontend sends env variable names, the app resolves them
+    parser.add_argument('--apikey', default='GROQ_API_KEY', help='env variable name of the Groq key')
+    parser.add_argument('--model', default='GROQ_MODEL', help='env variable name of the model')
+    parser.add_argument('--stream', action='store_true', help='ask for streamed summaries')
+    parser.add_argument('--turn-timeout', type=float, default=30)
+    asyncio.run(main(parser.parse_args()))
@@ -2,168 +2,65 @@ import asyncio
 import json
 import logging
 from datetime import date, datetime
-from typing import Dict
+from typing import Dict, Optional
 
 import httpx
 from fastapi import WebSocket
 
 from chatcode.function import *
+from chatcode.get_cache import cache_scopes, cache_ttl, get_cache, token_id
+from chatcode.http_pool import backend_pool
+from chatcode.single_flight import backend_flight
+from chatcode.table_render import render_table, send_table
 
 logger = logging.getLogger(__name__)
 
 
 async def onboard_personal_details(websocket: WebSocket, details: dict):
-    url = 'http://127.0.0.1:8000/personal/employees'
-    print(details)
-    print(type(details))
+    url = backend_pool.rebase('http://127.0.0.1:8000/personal/employees')
+    logger.debug("Onboarding payload: %s", details)
     payload = details
-    timeout_seconds = 30  # Timeout in seconds
 
     try:
-        # Initialize HTTP client with timeout
-        async with httpx.AsyncClient(timeout=timeout_seconds) as client:
-            response = await client.post(url, json=payload)
-            response.raise_for_status()
-            response_data = response.json()
-            response_data = response_data.get('detail')
+        # Shared keep-alive client, per-method timeout comes from the pool
+        response = await backend_pool.request("POST", url, json=payload)
+        response.raise_for_status()
+        response_data = response.json()
+        response_data = response_data.get('detail')
 
-            return response_data
+        return response_data
 
     except httpx.HTTPStatusError as e:
         # Include response text in error message for better diagnostics
         error_message = f"HTTP error occurred: {str(e)} - Status Code: {e.response.status_code}"
-        print("S", error_message)
+        logger.error(error_message)
         return error_message
 
     except httpx.RequestError as e:
         # General request error handling
         error_message = f"Request error occurred: {str(e)}"
-        print("R", error_message)
+        logger.error(error_message)
         return error_message
 
     except Exception as e:
         # Catch all other unexpected errors
         error_message = f"An unexpected error occurred: {str(e)}"
-        print('E', error_message)
+        logger.exception(error_message)
         return error_message
 
 
 def generate_html_table(data):
-    if not data:
-        return "<p>No data available</p>"
-
-    # Ensure data is a list of dictionaries
-    if isinstance(data, dict):
-        data = [data]  # Convert single dictionary to a list
-
-    if not data:
-        return "<p>No data available</p>"
-
-    # Extract unique headers while maintaining order
-    headers = []
-    for entry in data:
-        for key in entry.keys():
-            if key not in headers:
-                headers.append(key)
-
-    # Start building the HTML for the table with modern styles and black borders
-    table = '''
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-           body {
-            font-family: Arial, sans-serif;
-            background-color: #f7f7f8;
-            margin: 0;
-            padding: 0;
-            color: #333;
-        }
-        .table-wrapper {
-            width: 100%; /* Make the wrapper take full width of its parent */
-            max-width:990px; /* Limit the maximum width */
-            overflow-x: auto; /* Allow horizontal scrolling if needed */
-            margin: 20px auto; /* Center the wrapper and add margin */
-           b padding: 0 15px; /* Add some padding for smaller screens */
-            ox-sizing: border-box; /* Include padding in the width calculation */
-        }
-        table {
-            width: 100%; /* Ensure table takes the full width of the wrapper */
-            border-collapse: collapse;
-            box-shadow: 0 4px 8px rgba(0, 0, 0, 0.1);
-            margin: 0 auto; /* Center the table within the wrapper */
-            border: 2px solid black;  /* Black border around the table */
-            border-radius: 8px;
-        }
-        th, td {
-            padding: 12px 15px;
-            text-align: left;
-            border: 1px solid black;  /* Black border around cells */
-            white-space: nowrap; /* Prevent text from wrapping */
-        }
-        th {
-            background-color: #3C3D37;
-            color: #fff;
-            text-transform: uppercase;
-            border-bottom: 3px solid #000;  /* Thick bottom border for header */
-        }
-        tr:nth-child(even) {
-            background-color: #f9f9f9;
-        }
-        td {
-            transition: background-color 0.3s ease;
-        }
-
-        /* Responsive design adjustments */
-        @media (max-width: 768px) {
-            .table-wrapper {
-                padding: 0 10px; /* Adjust padding for smaller screens */
-            }
-            table {
-                font-size: 14px; /* Reduce font size for smaller screens */
-            }
-        }
-        @media (max-width: 1024px) {
-            .table-wrapper {
-                padding: 0 10px; /* Adjust padding for smaller screens */
-            }
-            table {
-                font-size: 14px; /* Reduce font size for smaller screens */
-            }
-        }
-        </style>
-    </head>
-    <body>
-        <div class="table-wrapper">
-            <table>
-                <thead>
-                    <tr>'''
-
-    # Create table headers
-    for header in headers:
-        table += f'<th>{header}</th>'
-
-    table += '''
-                    </tr>
-                </thead>
-                <tbody>'''
-
-    # Create table rows
-    for row in data:
-        table += '<tr>'
-        for header in headers:
-            table += f'<td>{row.get(header, "N/A")}</td>'
-        table += '</tr>'
-
-    table += '''
-                </tbody>
-            </table>
-        </div>
-    </body>
-    </html>
-    '''
-
-    return table
+    return render_table(data)
+
+
+async def backend_get(bearer_token: str, url: str, query_params: dict, cache_key: Optional[str] = None) -> httpx.Response:
+    # Identical concurrent GETs for the same token share one backend request.
+    # A cached GET joins only calls made under the same cache generations, so
+    # a read started after a write never adopts a response fetched before it
+    headers = {"Authorization": f"Bearer {bearer_token}"}
+    flight_key = cache_key or (token_id(bearer_token), url, json.dumps(query_params, sort_keys=True))
+    return await backend_flight.do(
+        flight_key, lambda: backend_pool.request("GET", url, params=query_params, headers=headers))
 
 
 async def database_operation(websocket: WebSocket, details: dict):
@@ -171,7 +68,6 @@ async def database_operation(websocket: WebSocket, details: dict):
     payload = details.get('payload', {})
     query_params = details.get('query_params', {})
     method = details.get('method', 'GET').upper()
-    timeout_seconds = 30
 
     bearer_token = details.get('bearer_token')
 
@@ -180,8 +76,8 @@ async def database_operation(websocket: WebSocket, details: dict):
         return "Bearer token is missing."
 
     try:
-        print(url_template)
-        url = url_template.format(**payload)
+        logger.debug("Backend URL template: %s", url_template)
+        url = backend_pool.rebase(url_template.format(**payload))
     except KeyError as e:
         missing_key = str(e).strip("'")
         await websocket.send_text(f"Missing value for placeholder: {missing_key}.")
@@ -190,42 +86,55 @@ async def database_operation(websocket: WebSocket, details: dict):
     headers = {"Authorization": f"Bearer {bearer_token}"}
 
     method_dispatch = {
-        "GET": lambda client: client.get(url, params=query_params, headers=headers),
-        "DELETE": lambda client: client.delete(url, headers=headers),
-        "PUT": lambda client: client.put(url, json=payload, headers=headers),
-        "POST": lambda client: client.post(url, json=payload, headers=headers)
+        "GET": lambda: backend_get(bearer_token, url, query_params, cache_key),
+        "DELETE": lambda: backend_pool.request("DELETE", url, headers=headers),
+        "PUT": lambda: backend_pool.request("PUT", url, json=payload, headers=headers),
+        "POST": lambda: backend_pool.request("POST", url, json=payload, headers=headers)
     }
 
     if method not in method_dispatch:
         await websocket.send_text(f"Unsupported HTTP method: {method}")
         return f"Unsupported HTTP method: {method}"
 
+    ttl = cache_ttl(details) if method == 'GET' else 0
+    cache_key = None
+    if ttl:
+        cache_key = await get_cache.key(bearer_token, url, query_params, cache_scopes(details))
+        cached = await get_cache.get(cache_key)
+        if cached is not None:
+            await send_table(websocket, cached)
+            return "Table", "Return"
+
     try:
 
-        async with httpx.AsyncClient(timeout=timeout_seconds) as client:
-            response = await method_dispatch[method](client)
-            print('__________')
-            if response.status_code == 500:
-                error_message = response.text
-                print(f"Error: {error_message}")
-                response_data = error_message
-                return response_data, payload
-
-            if response.status_code >= 400:
-                error_message = response.text
-                print(f"Error: {error_message}")
-                response_data = error_message
-                return response_data, payload
-
-            response_data = response.json()
-            print(response_data)
-
-            if method == 'GET':  # "Table","Return"
-                html_table = generate_html_table(response_data)
-                await websocket.send_text(f"{html_table}")
-                return "Table", "Return"
-            else:  # result and payload, result and not payload
-                return response_data, payload
+        response = await method_dispatch[method]()
+        if response.status_code == 500:
+            error_message = response.text
+            logger.error("Backend %s %s failed with %s: %s", method, url, response.status_code, error_message)
+            response_data = error_message
+            return response_data, payload
+
+        if response.status_code >= 400:
+            error_message = response.text
+            logger.warning("Backend %s %s failed with %s: %s", method, url, response.status_code, error_message)
+            response_data = error_message
+            return response_data, payload
+
+        response_data = response.json()
+        logger.debug("Backend response: %s", response_data)
+
+        if ttl:
+            await get_cache.set(cache_key, response_data, ttl)
+        elif method != 'GET':
+            # Reads cached before this write are stale now
+            await get_cache.invalidate(bearer_token, cache_scopes(details))
+
+        if method == 'GET':  # "Table","Return"
+            # Rows go out in bounded pages/chunks, see chatcode/table_render.py
+            await send_table(websocket, response_data)
+            return "Table", "Return"
+        else:  # result and payload, result and not payload
+            return response_data, payload
 
     except Exception as e:
         error_message = f"An unexpected error occurred: {str(e)}"
@@ -0,0 +1,54 @@
+from fastapi import WebSocket
+
+from chatcode.summary import SUMMARY_MODE, SUMMARY_MODES
+from chatcode.table_render import TABLE_ROW_CAP
+
+RESULT_FORMATS = ('html', 'columnar')
+
+
+# Options are parsed from untrusted frames; a bad value falls back to the
+# default instead of failing every message on the socket
+def int_option(value, default: int, minimum: int = 1) -> int:
+    if value is None:
+        return default
+    try:
+        return max(minimum, int(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def flag_option(value, default: bool = False) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', '1', 'yes')
+    return default if value is None else bool(value)
+
+
+class ClientOptions:
+    # Capabilities the frontend opts into with its first /ws/chat frame
+    def __init__(self, stream: bool = False, chunked_tables: bool = False, table_page_size: int = TABLE_ROW_CAP,
+                 result_format: str = 'html', summary_mode: str = SUMMARY_MODE):
+        self.stream = stream
+        self.chunked_tables = chunked_tables
+        self.table_page_size = table_page_size
+        # 'columnar' sends GET results as {"columns": [...], "rows": [[...]]} instead of HTML
+        self.result_format = result_format if result_format in RESULT_FORMATS else 'html'
+        # How write results are summarised, see chatcode.summary
+        self.summary_mode = summary_mode if summary_mode in SUMMARY_MODES else SUMMARY_MODE
+
+    @classmethod
+    def from_frame(cls, data_json: dict) -> "ClientOptions":
+        return cls(
+            stream=flag_option(data_json.get('stream')),
+            chunked_tables=flag_option(data_json.get('table_chunks')),
+            table_page_size=int_option(data_json.get('table_page_size'), TABLE_ROW_CAP),
+            result_format=data_json.get('result_format', 'html'),
+            summary_mode=data_json.get('summary', SUMMARY_MODE),
+        )
+
+
+def negotiate_options(websocket: WebSocket, data_json: dict) -> ClientOptions:
+    options = getattr(websocket.state, 'client_options', None)
+    if options is None:
+        options = ClientOptions.from_frame(data_json)
+        websocket.state.client_options = options
+    return options
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+CHATCODE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_DIR = os.getenv('CONFIG_DIR', os.path.dirname(CHATCODE_DIR))
+CONFIG_RELOAD_INTERVAL = float(os.getenv('CONFIG_RELOAD_INTERVAL', '2'))
+
+# role name -> (config file, whether the file is a role project script)
+CONFIG_FILES = {
+    'admin': (os.path.join(CONFIG_DIR, 'admin.json'), True),
+    'employee': (os.path.join(CONFIG_DIR, 'employee.json'), True),
+    'teamlead': (os.path.join(CONFIG_DIR, 'teamlead.json'), True),
+    'onboard': (os.path.join(CHATCODE_DIR, 'onboard.json'), False),
+}
+
+
+def role_key(role: str) -> str:
+    # Accept both 'admin' and the 'admin.json' name returned by choose_json
+    if role and role.endswith('.json'):
+        return role[:-len('.json')]
+    return role
+
+
+class RoleConfig:
+    def __init__(self, role: str, path: str, config: dict, mtime: float, version: int, projects: bool):
+        self.role = role
+        self.path = path
+        self.config = config
+        self.mtime = mtime
+        self.version = version
+        # Precomputed per-role lookups, treat as read-only
+        self.project_info: Dict[str, str] = {}
+        self.payload_schemas: Dict[str, dict] = {}
+        if projects:
+            for name, project in config.items():
+                if 'project description' in project:
+                    self.project_info[name] = project['project description']
+                else:
+                    logger.warning(f"Warning: 'project description' missing for {name}")
+                self.payload_schemas[name] = project.get('payload', {})
+
+
+class ConfigRegistry:
+    def __init__(self, files: Dict[str, tuple], reload_interval: float = CONFIG_RELOAD_INTERVAL):
+        self.files = files
+        self.reload_interval = reload_interval
+        self._configs: Dict[str, RoleConfig] = {}
+        self._listeners: List[Callable[[str], None]] = []
+        self._watch_task: Optional[asyncio.Task] = None
+
+    def _load(self, role: str) -> RoleConfig:
+        path, projects = self.files[role]
+        mtime = os.stat(path).st_mtime
+        with open(path, 'r') as f:
+            config = json.load(f)
+        previous = self._configs.get(role)
+        version = previous.version + 1 if previous else 1
+        loaded = RoleConfig(role, path, config, mtime, version, projects)
+        self._configs[role] = loaded
+        return loaded
+
+    def load_all(self):
+        for role in self.files:
+            self._load(role)
+        logger.info(f"Loaded config for roles: {', '.join(self._configs)}")
+
+    def get(self, role: str) -> RoleConfig:
+        role = role_key(role)
+        loaded = self._configs.get(role)
+        if loaded is None:
+            if role not in self.files:
+                raise KeyError(f"Unknown role configuration: {role}")
+            loaded = self._load(role)
+        return loaded
+
+    def project_info(self, role: str) -> Dict[str, str]:
+        return self.get(role).project_info
+
+    def project(self, role: str, project_name: str) -> Optional[dict]:
+        return self.get(role).config.get(project_name)
+
+    def payload_schema(self, role: str, project_name: str) -> Optional[dict]:
+        return self.get(role).payload_schemas.get(project_name)
+
+    def version(self, role: str) -> int:
+        return self.get(role).version
+
+    def add_listener(self, callback: Callable[[str], None]):
+        # Called with the role name after its file has been reloaded
+        self._listeners.append(callback)
+
+    def _reload_changed(self) -> List[str]:
+        reloaded = []
+        for role, (path, _) in self.files.items():
+            try:
+                mtime = os.stat(path).st_mtime
+                current = self._configs.get(role)
+                if current is not None and current.mtime == mtime:
+                    continue
+                self._load(role)
+                reloaded.append(role)
+            except (OSError, json.JSONDecodeError) as e:
+                # Keep serving the last good config until the file is fixed
+                logger.error(f"Error reloading config for {role}: {e}")
+        return reloaded
+
+    def _notify(self, reloaded: List[str]):
+        for role in reloaded:
+            logger.info(f"Reloaded config for role: {role}")
+            for callback in self._listeners:
+                callback(role)
+
+    def reload_if_changed(self) -> List[str]:
+        reloaded = self._reload_changed()
+        self._notify(reloaded)
+        return reloaded
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            # File I/O and parsing happen off the event loop, listeners run on it
+            reloaded = await asyncio.to_thread(self._reload_changed)
+            self._notify(reloaded)
+
+    def start(self):
+        self.load_all()
+        if self.reload_interval > 0 and self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+
+registry = ConfigRegistry(CONFIG_FILES)
@@ -0,0 +1,61 @@
+import os
+from collections import Counter, deque
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 0 means unlimited retries
+SLOT_MAX_ATTEMPTS = int(os.getenv('SLOT_MAX_ATTEMPTS', '5'))
+PROJECT_MAX_ATTEMPTS = int(os.getenv('PROJECT_MAX_ATTEMPTS', '3'))
+
+
+def attempts_exhausted(attempts: int, max_attempts: int) -> bool:
+    return max_attempts > 0 and attempts >= max_attempts
+
+
+class DialogState:
+    # Slot-filling progress for one conversation: which fields are still
+    # pending, how often each was answered wrongly, and the accepted values.
+    def __init__(self, values: Dict[str, Any], max_attempts: int = SLOT_MAX_ATTEMPTS):
+        self.values = dict(values)
+        self.pending = deque(key for key, value in self.values.items() if value is None or value == "None")
+        self.attempts = Counter()
+        self.max_attempts = max_attempts
+
+    @classmethod
+    def from_payload(cls, pay: dict, max_attempts: int = SLOT_MAX_ATTEMPTS) -> "DialogState":
+        return cls(pay['payload'], max_attempts)
+
+    def to_dict(self) -> dict:
+        return {
+            'values': self.values,
+            'pending': list(self.pending),
+            'attempts': dict(self.attempts),
+            'max_attempts': self.max_attempts,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DialogState":
+        state = cls(data['values'], data.get('max_attempts', SLOT_MAX_ATTEMPTS))
+        state.pending = deque(data['pending'])
+        state.attempts = Counter(data.get('attempts', {}))
+        return state
+
+    @property
+    def current(self) -> Optional[str]:
+        return self.pending[0] if self.pending else None
+
+    @property
+    def done(self) -> bool:
+        return not self.pending
+
+    def accept(self, key: str, value: Any):
+        self.values[key] = value
+        self.pending.remove(key)
+
+    def reject(self, key: str) -> bool:
+        # The field stays first in line; True once its retry budget is spent
+        self.attempts[key] += 1
+        return attempts_exhausted(self.attempts[key], self.max_attempts)
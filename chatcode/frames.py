@@ -0,0 +1,40 @@
+import json
+from uuid import uuid4
+
+from fastapi import WebSocket
+
+# Structured frames are JSON objects with a "type" key so the frontend can
+# tell them apart from the plain-text chat messages sent elsewhere.
+
+
+async def send_frame(websocket: WebSocket, frame_type: str, **fields):
+    # Compact separators; uvicorn's websockets server already negotiates
+    # permessage-deflate with clients that offer it, so frames are compressed on the wire
+    await websocket.send_text(json.dumps({"type": frame_type, **fields}, separators=(',', ':')))
+
+
+async def send_busy(websocket: WebSocket, retry_after: float):
+    # The LLM queue for this key is full; the client may resend after retry_after seconds
+    await send_frame(websocket, 'busy', retry_after=round(retry_after, 1),
+                     text="We're handling a lot of requests right now. Please try again in a moment.")
+
+
+class StreamWriter:
+    # start -> delta* -> end, all tagged with one id per streamed message
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.id = uuid4().hex
+        self.parts = []
+
+    async def start(self):
+        await send_frame(self.websocket, 'stream', event='start', id=self.id)
+
+    async def delta(self, text: str):
+        self.parts.append(text)
+        await send_frame(self.websocket, 'stream', event='delta', id=self.id, text=text)
+
+    async def end(self, text: str = None, error: str = None):
+        fields = {'text': ''.join(self.parts) if text is None else text}
+        if error:
+            fields['error'] = error
+        await send_frame(self.websocket, 'stream', event='end', id=self.id, **fields)
@@ -1,18 +1,17 @@
 import json
 import logging
-import os
 import re
-from datetime import datetime
-from typing import Any, Dict
 
-import groq
 from dotenv import load_dotenv
 from fastapi import WebSocket
-from groq import Groq
 
-# Setup logging
+from chatcode.config_registry import registry
+from chatcode.dialog_state import (SLOT_MAX_ATTEMPTS, DialogState,
+                                   attempts_exhausted)
+from chatcode.metrics import user_wait
+from chatcode.schema_compiler import compile_schema
+
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
 load_dotenv()
 
@@ -43,98 +42,13 @@ def sanitize_json_string(response_text: str) -> str:
     return "{}"
 
 
-async def get_project_details(websocket: WebSocket, query: str, jsonfile: str, apikey, model):
-    projectinfo = {}
-    try:
-        with open(jsonfile, 'r') as f:
-            json_config = json.load(f)
-            project_names = json_config.keys()
-            for i in project_names:
-                if 'project description' in json_config[i]:
-                    projectinfo[i] = json_config[i]['project description']
-                else:
-                    logging.warning(
-                        f"Warning: 'project description' missing for {i}")
-    except Exception as e:
-        print(f"Error while processing the get project details: {e}")
-        await websocket.send_text("Error while processing the get project details : project info")
-
-    client = Groq(api_key=os.getenv(apikey))
-    try:
-        response = client.chat.completions.create(
-            model=os.getenv(model),
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"""
-            You are an AI assistant trained to extract project names based on project descriptions. Follow these steps:
-
-            1. Correct any grammatical or spelling errors in the query.
-            2. Review the provided project descriptions: {projectinfo}.
-            3. Analyze the user query: "{query}" to determine which project name, if any, is referenced based on the descriptions.
-            4. If a project name matches the query context, return that project name.
-            5. If no project name matches or the query is unclear, return 'None'.
-            6. The result should be a JSON object with the format shown below.
-
-            Example:
-            Query: "How do I update my project?"
-            Project Titles and Descriptions: {projectinfo}
-            Response:
-            ~~~
-            {{
-                "project": "Project XYZ"
-            }}
-            ~~~
-
-            Ensure the response is enclosed with `~~~` before and after the JSON output. Do not include any additional explanations.
-            """
-                },
-                {
-                    "role": "user",
-                    "content": f"Extract the project name from the following query: {query} and Project Titles and Descriptions: {projectinfo}."
-                }
-            ]
-        )
-
-        response_text = response.choices[0].message.content.strip()
-        json_start_idx = response_text.find("~~~")
-        json_end_idx = response_text.rfind("~~~") + 1
-        result = response_text[json_start_idx:json_end_idx]
-        result = sanitize_json_string(result)
-        project_name = json.loads(result).get("project")
-
-        if project_name == "None" or project_name is None:
-            await websocket.send_text("You have asked for an irrelevant query. Ask anything from the listed projects:")
-            user_input = await websocket.receive_text()
-            user_input_data = json.loads(user_input)
-            query = user_input_data.get("message")
-            return await get_project_details(websocket, query, jsonfile, apikey, model)
-        return query, project_name
-
-    except client.exceptions.GroqAPIError as groq_error:
-        print(f"Groq API error: {groq_error}")
-        await websocket.send_text("Error: Failed to process the response from Groq API.")
-        return "query", "Groq API error"
-
-    except Exception as e:
-        print(f"Error while processing the response: {e}")
-        await websocket.send_text(e)
-        await websocket.send_text("Error: Failed to process the response on get project detail.")
-
-
 def get_project_script(project_name: str, jsonfile: str):
     try:
-        with open(jsonfile, 'r') as f:
-            json_config = json.load(f)
-            project_script = json_config.get(project_name)
-            return project_script
+        return registry.project(jsonfile, project_name)
 
-    except FileNotFoundError:
-        print("Error: The file was not found.")
+    except KeyError:
+        logger.error(f"Project '{project_name}' was not found in {jsonfile}")
         return "Error: The configuration file was not found on get_project_script."
-    except json.JSONDecodeError:
-        print("Error: Failed to decode JSON from the file.")
-        return "Error: Failed to read the configuration file on get_project_script."
 
 
 def split_payload_fields(project_detail: dict):
@@ -143,11 +57,10 @@ def split_payload_fields(project_detail: dict):
         return payload_detail
 
     except KeyError as e:
-        print(
-            f"Error: Missing expected key in project details on split_payload_fields: {e}")
+        logger.error(f"Missing expected key in project details on split_payload_fields: {e}")
         return "Error: Missing expected key in project details on split_payload_fields."
     except TypeError:
-        print("Error: The project detail provided is not a dictionary on split_payload_fields.")
+        logger.error("The project detail provided is not a dictionary on split_payload_fields.")
         return "Error: The project detail provided is not a dictionary on split_payload_fields."
 
 
@@ -164,205 +77,57 @@ def verify_values_from_query(query, payload, config):
     return verified_payload
 
 
-async def fill_payload_values(websocket: WebSocket, query: str, payload_details: dict, jsonfile: str, apikey, model) -> Dict[str, Any]:
-    client = Groq(api_key=os.getenv(apikey))
-    try:
-        response = client.chat.completions.create(
-            model=os.getenv(model),
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"""You are an expert in filling payload values from a user query based on a configuration file.
-
-                        Strict Instructions:
-                        1. **Capture Only from User Query:** Extract values strictly from the user query: {query}. Do **not** infer or assume any values.                        
-                        2. **Use Assigned Values:** If a value is missing in the user query or doesn't match the required format/choices, **use the assigned value** specified in the configuration file {payload_details}.        
-                        3. **Fill Missing Fields with Assigned Values:** For each field not found in the user query, refer to the configuration file for the field's assigned value. If no valid input is found in the query and no assigned value is provided, use "None".
-                        4. **JSON Response Format:** Return only the payload JSON response in the following format, enclosed with `~~~` before and after the response.
-                    
-                    Example output format:
-                        query: get leave records by month and year
-                        ~~~{{
-                            "payload": {{
-                                "employee_id": "None",
-                                "monthnumber": "None",
-                                "yearnumber": "None"
-                            }}
-                        }}~~~
-                """
-                },
-                {
-                    "role": "user",
-                    "content": f"Analyze the following query: {query} with config file: {payload_details} and extract values based on the user input or use assigned values from the config file."
-                }
-            ]
-        )
-
-        response_text = response.choices[0].message.content.strip()
-        json_start_idx = response_text.find("~~~")
-        json_end_idx = response_text.rfind("~~~") + 1
-        result = response_text[json_start_idx:json_end_idx]
-        sanitized_response = sanitize_json_string(result)
-        try:
-            result = json.loads(sanitized_response)
-            response_config = result.get('payload', {})
-            verified_payload = verify_values_from_query(
-                query, response_config, payload_details)
-            return verified_payload
-
-        except json.JSONDecodeError:
-            logger.error(
-                "Error: Failed to decode JSON from the response on fill_payload_values.")
-            await websocket.send_text("Error: Failed to decode JSON from the response on fill_payload_values.")
-
-    except client.exceptions.GroqAPIError as groq_error:
-        print(f"Groq API error: {groq_error}")
-        await websocket.send_text("Error: Failed to process the response from Groq API.")
-        return "Groq API error"
-
-    except Exception as e:
-        logger.error(
-            f"Error while processing the response on fill_payload_values: {e}")
-        await websocket.send_text(e)
-        await websocket.send_text("Error while processing the response on fill_payload_values")
+def validate(payload_detail, response_config):
+    # Validators (compiled regexes, choice sets, date parsers) are built once per project
+    return compile_schema(payload_detail).validate(response_config)
 
 
-def validate(payload_detail, response_config):
-    payload_details = payload_detail['payload']
-    validated_payload = {}
-
-    for key, values in payload_details.items():
-        if key in response_config.keys():
-            value = response_config.get(key)
-            # required = values.get('required', False)
-
-            # Normalize 'None' string to None
-            if value == "None":
-                value = None
-
-            # If the field is required and missing, set to None
-            if value is None:
-                # if required:
-                validated_payload[key] = None
-                continue
-
-            # Check datatype and format
-            datatype = values['datatype']
-
-            if datatype == 'regex':
-                pattern = values['format']
-                if not re.match(pattern, value):
-                    validated_payload[key] = None
-                    continue
-
-            elif datatype == 'date':
-                formats = values.get('formats', [])
-                if not formats:
-                    formats = [
-                        '%Y-%m-%d',       # 2024-09-13
-                        '%Y/%m/%d',       # 2024/09/13
-                        '%Y.%m.%d',       # 2024.09.13
-                        '%Y %b %d',       # 2024 Sep 13]
-                    ]
-                value = value.strip()
-                valid_date = False
-                for fmt in formats:
-                    try:
-                        datetime.strptime(value, fmt)
-                        valid_date = True
-                        break
-                    except ValueError:
-                        continue
-
-                if not valid_date:
-                    validated_payload[key] = None
-                    continue
-
-            elif datatype == 'choices':
-                choices = values['choices']
-                if value not in choices:
-                    validated_payload[key] = None
-                    continue
-
-            elif datatype == 'string' and value != 'None':
-                if not isinstance(value, str):
-                    validated_payload[key] = None
-                    continue
-
-            elif datatype == 'integer':
-                try:
-                    # Try to cast the value to an integer
-                    int(value)
-                except ValueError:
-                    validated_payload[key] = None
-                    continue
-
-            elif datatype == 'mobile':
-                try:
-                    # Check if the value is an integer and has 10 digits
-                    int_value = int(value)
-                    if len(str(int_value)) != 10:
-                        validated_payload[key] = None
-                        continue
-                except ValueError:
-                    validated_payload[key] = None
-                    continue
-
-            # If all checks pass, keep the value
-            validated_payload[key] = value
-
-    final_response = {
-        'project': payload_detail['project'],
-        'url': payload_detail['url'],
-        'method': payload_detail['method'],
-        'payload': validated_payload
-    }
-    return final_response
-
-
-async def update_process_with_user_input(websocket: WebSocket, project_details: dict, data: dict):
+async def update_process_with_user_input(websocket: WebSocket, project_details: dict, data: dict, session=None):
     try:
         update_payload = data['payload']
         available_fields = list(update_payload.keys())
 
         if len(available_fields) <= 2:
-            print('less than 2')
+            logger.debug("Two or fewer fields to update, asking for all of them")
             verified_fields = available_fields
         else:
             verified_fields = []
             for key, value in project_details['payload'].items():
                 if value['required'] == True:
                     verified_fields.append(key)
-            print('true fields:', verified_fields)
+            logger.debug("Required fields: %s", verified_fields)
 
             available_field = []
             for key, value in project_details['payload'].items():
                 if value['required'] == False:
                     available_field.append(key)
-            print('false fields:', available_field)
+            logger.debug("Optional fields: %s", available_field)
 
             if len(available_field) != 0:
 
                 choices_list = ",".join(available_field)
-                print(choices_list)
                 choices_list = choices_list + ",All"
-                print(choices_list)
                 message = 'Select "All" or pick a field from the available choices below'
-                await websocket.send_text(f"{message}.Fields:{choices_list} ")
-                fields_input = await websocket.receive_text()
-                fields_input = json.loads(fields_input)
-                fields_input = fields_input.get('message')
+                attempts = 0
+                while True:
+                    await websocket.send_text(f"{message}.Fields:{choices_list} ")
+                    with user_wait():
+                        fields_input = await websocket.receive_text()
+                    fields_input = json.loads(fields_input)
+                    fields_input = fields_input.get('message')
+                    if fields_input:
+                        break
 
-                if not fields_input:
+                    attempts += 1
+                    if attempts_exhausted(attempts, SLOT_MAX_ATTEMPTS):
+                        await websocket.send_text("No fields provided. Please start your request again.")
+                        return None
                     await websocket.send_text("No fields provided. Please try again.")
-                    return None
 
                 if fields_input.lower() == 'all':
-                    print('all')
-                    print(available_fields)
+                    logger.debug("Updating all fields: %s", available_fields)
                     verified_fields.extend(available_fields)
                 else:
-                    print('selected columns')
                     fields_to_update = [field.strip().replace("'", "").replace(
                         "[", "").replace("]", "") for field in fields_input.split(',')]
                     available_fields = [
@@ -372,7 +137,7 @@ async def update_process_with_user_input(websocket: WebSocket, project_details:
             for key, value in project_details['payload'].items():
                 if value['required'] == True and key not in verified_fields:
                     verified_fields.append(key)
-            print("final output", verified_fields)
+            logger.debug("Fields to update: %s", verified_fields)
 
         if not verified_fields:
             await websocket.send_text("No Verified Fields check update_process_with_user_input.")
@@ -381,26 +146,22 @@ async def update_process_with_user_input(websocket: WebSocket, project_details:
         for i in verified_fields:
             updated_fields[i] = 'None'
 
-        updated = {'project': project_details['project'],
-                   'url': project_details['url'],
-                   'method': project_details['method'],
-                   'payload': updated_fields}
+        # Keep what validate() added beside the payload (cache ttl/scope, summary template)
+        updated = dict(data, payload=updated_fields)
 
-        response = await ask_user(websocket, project_details, updated)
+        response = await ask_user(websocket, project_details, updated, session)
         return response
 
     except Exception as e:
-        print(f"Error occurred in update_process_with_user_input: {e}")
+        logger.exception(f"Error occurred in update_process_with_user_input: {e}")
         await websocket.send_text(f"Error occurred in update_process_with_user_input: {e}")
 
 
-async def update_process(websocket: WebSocket, project_details: dict, data: dict):
+async def update_process(websocket: WebSocket, project_details: dict, data: dict, session=None):
     update_payload = data['payload']
     if all(value is None or value == "None" for value in update_payload.values()):
-        updated_details = await update_process_with_user_input(websocket, project_details, data)
-        print("++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
-        print("update output:", updated_details)
-        print("++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
+        updated_details = await update_process_with_user_input(websocket, project_details, data, session)
+        logger.debug("update output: %s", updated_details)
         return updated_details
     else:
         b = data['payload']
@@ -411,16 +172,9 @@ async def update_process(websocket: WebSocket, project_details: dict, data: dict
             if value is not None and value != "None":
                 filtered_payload[key] = value
 
-        # Create a new dictionary including project, url, method, and filtered payload
-        result = {
-            'project': data['project'],
-            'url': data['url'],
-            'method': data['method'],
-            'payload': filtered_payload
-        }
-        print("++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
-        print("update output direct:", result)
-        print("++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++")
+        # Same details as validate() returned, with only the filled payload fields
+        result = dict(data, payload=filtered_payload)
+        logger.debug("update output direct: %s", result)
         return result
 
 
@@ -429,63 +183,59 @@ def normalize_string(value: str) -> str:
         return value.strip().lower()
 
 
-async def ask_user(websocket: WebSocket, pro, pay):
-    abc = pay['payload'].copy()
-    for key, value in abc.items():
-        if value is None or value == "None":
-            des = pro['payload'][key]['description']
-            data_type = pro['payload'][key]['datatype']
-
-            if data_type == "choices":
-                choices = pro['payload'][key]['choices']
-                choices_list = ",".join(choices)
-                await websocket.send_text(f"Please provide  {des}. Choices are: {choices_list}")
-            else:
-                await websocket.send_text(f"Please provide {des}")
+# First messages that only ask to pick up the pending dialog where it stopped
+RESUME_COMMANDS = {'resume', 'continue'}
+
+
+def answer_pending(pro: dict, state: DialogState, message) -> bool:
+    # A reconnecting client's first message may already answer the pending
+    # slot; accepted answers are recorded in the state like ask_user does
+    key = state.current
+    if key is None:
+        return False
+    value = normalize_string(message)
+    if compile_schema(pro).validate_field(key, value) is None:
+        return False
+    state.accept(key, value)
+    return True
+
+
+async def ask_user(websocket: WebSocket, pro, pay, session=None, state=None):
+    schema = compile_schema(pro)
+    if state is None:
+        state = DialogState.from_payload(pay)
+    while not state.done:
+        if session is not None:
+            # Persist progress so a reconnecting client resumes at this slot
+            await session.save_dialog(pro, pay, state)
+        key = state.current
+        des = pro['payload'][key]['description']
+        data_type = pro['payload'][key]['datatype']
+
+        if data_type == "choices":
+            choices = pro['payload'][key]['choices']
+            choices_list = ",".join(choices)
+            await websocket.send_text(f"Please provide  {des}. Choices are: {choices_list}")
+        else:
+            await websocket.send_text(f"Please provide {des}")
 
+        with user_wait():
             user_input = await websocket.receive_text()
-            user_input_data = json.loads(user_input)
-            cleanstr = user_input_data.get("message")
-            abc[key] = normalize_string(cleanstr)
-            valid = validate(pro, abc)
-
-            if valid['payload'][key] is None:
-                return await ask_user(websocket, pro, valid)
-            else:
-                pay['payload'][key] = abc[key]
+        user_input_data = json.loads(user_input)
+        cleanstr = user_input_data.get("message")
+        value = normalize_string(cleanstr)
+
+        # Only the answered field needs checking, the others are already validated
+        if schema.validate_field(key, value) is None:
+            if state.reject(key):
+                if session is not None:
+                    await session.clear_dialog()
+                await websocket.send_text(f"Too many invalid answers for {des}. Please start your request again.")
+                return None
+            continue
+        state.accept(key, value)
+
+    if session is not None:
+        await session.clear_dialog()
+    pay['payload'].update(state.values)
     return pay
-
-
-async def nlp_response(websocket: WebSocket, answer, payload, apikey, model):
-    try:
-        client = Groq(api_key=os.getenv(apikey))
-        response = client.chat.completions.create(
-            model=os.getenv(model),
-            messages=[
-                {
-                    "role": "system",
-                    "content": """
-                    You are an AI assistant responsible for explaining technical SQL operation results in simple and user-friendly terms. 
-                    The user has performed a CRUD operation (Create, Read, Update, Delete) using an API that interacts with a database.
-                    
-                    Provide a concise, clear summary of the operation result in **under 40 words**. Include the relevant payload values.
-                    Avoid technical jargon and ensure the explanation is easily understandable by non-technical users.
-                    """
-                },
-                {
-                    "role": "user",
-                    "content": f"The API response is: {answer}. The payload is: {payload}. Please summarize the result in a user-friendly way."
-                }
-            ]
-        )
-        response_text = response.choices[0].message.content.strip()
-        return response_text
-
-    except client.exceptions.GroqAPIError as groq_error:
-        print(f"Groq API error: {groq_error}")
-        await websocket.send_text("Error: Failed to process the response from Groq API.")
-        return "Groq API error"
-
-    except Exception as e:
-        logging.error(f"Error during API call: {e}")
-        await websocket.send_text(f"Error occurred in nlp_response: {e}")
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import Any, List, Optional
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+
+from chatcode.metrics import Counter
+from chatcode.shared_state import StateBackend, state_backend
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+GET_CACHE_ENABLED = os.getenv('GET_CACHE_ENABLED', 'true').lower() == 'true'
+# TTL for GET projects whose role JSON has no "cache ttl"; 0 leaves them uncached
+GET_CACHE_DEFAULT_TTL = float(os.getenv('GET_CACHE_DEFAULT_TTL', '0'))
+GET_CACHE_MAX_ENTRIES = int(os.getenv('GET_CACHE_MAX_ENTRIES', '5000'))
+# Generation counters must outlive every entry that embeds them
+GENERATION_TTL = 86400
+
+get_cache_requests = Counter('get_cache_requests_total', 'Backend GET cache lookups by outcome.')
+get_cache_invalidations = Counter('get_cache_invalidations_total', 'Backend writes that invalidated cached GETs.')
+
+_ID_SEGMENT = re.compile(r'^\d+$')
+
+
+def token_id(bearer_token: str) -> str:
+    # Tokens never reach the state backend, only a digest of them
+    return hashlib.sha256(bearer_token.encode()).hexdigest()[:24]
+
+
+def url_scope(url: str) -> str:
+    # /leave/details -> "leave", /admin/roles/3/functions/ -> "admin/roles";
+    # a write anywhere in a scope evicts every cached GET in it
+    segments = [segment for segment in urlsplit(url).path.split('/') if segment]
+    if not segments:
+        return ''
+    if segments[0] == 'admin' and len(segments) > 1 and not _ID_SEGMENT.match(segments[1]):
+        return '/'.join(segments[:2])
+    return segments[0]
+
+
+class GetCache:
+    # Read-through cache for backend GETs keyed on (token, URL, params).
+    # Entries embed generation counters, one for the caller's token and one per
+    # invalidation scope; a successful write bumps its token and scopes, so the
+    # writer always sees its own change and other users see it at once in every
+    # scope the write declares (or after the short TTL for anything else).
+    NAMESPACE = 'get'
+    GEN_NAMESPACE = 'get_gen'
+
+    def __init__(self, backend: StateBackend, max_entries: int = GET_CACHE_MAX_ENTRIES):
+        self.backend = backend
+        backend.configure_namespace(self.NAMESPACE, max_entries)
+        # Counters are LRU-evicted too; an evicted one restarts at 0 and could
+        # revive stale entries, so leave room for far more counters than entries
+        backend.configure_namespace(self.GEN_NAMESPACE, max_entries * 4)
+
+    async def _generation(self, name: str) -> str:
+        return await self.backend.get(self.GEN_NAMESPACE, name) or '0'
+
+    async def key(self, bearer_token: str, url: str, params: Optional[dict], scopes: List[str]) -> str:
+        # Take the key before the backend request and file the response under
+        # it: a write landing meanwhile bumps the generations, so the possibly
+        # stale response ends up unreachable instead of under the new ones
+        token = token_id(bearer_token)
+        token_gen = await self._generation(f"token:{token}")
+        scope_gens = [await self._generation(f"scope:{scope}") for scope in scopes]
+        return json.dumps([token, token_gen, scope_gens, url, sorted((params or {}).items())])
+
+    async def get(self, key: str) -> Optional[Any]:
+        data = await self.backend.get(self.NAMESPACE, key)
+        get_cache_requests.inc(outcome='hit' if data is not None else 'miss')
+        return json.loads(data) if data is not None else None
+
+    async def set(self, key: str, value: Any, ttl: float):
+        await self.backend.set(self.NAMESPACE, key, json.dumps(value), ttl)
+
+    async def invalidate(self, bearer_token: str, scopes: List[str]):
+        await self.backend.incr(self.GEN_NAMESPACE, f"token:{token_id(bearer_token)}", 1, GENERATION_TTL)
+        for scope in scopes:
+            await self.backend.incr(self.GEN_NAMESPACE, f"scope:{scope}", 1, GENERATION_TTL)
+            get_cache_invalidations.inc(scope=scope)
+
+
+def cache_scopes(details: dict) -> List[str]:
+    # "cache scope" in the role JSON (one name or a list) ties related URL
+    # families together, e.g. /leave/... writes and /admin/pending reads;
+    # projects without one fall back to their URL's first path segment
+    scope = details.get('cache_scope')
+    if scope is None:
+        return [url_scope(details['url'])]
+    return [scope] if isinstance(scope, str) else list(scope)
+
+
+def cache_ttl(details: dict) -> float:
+    if not GET_CACHE_ENABLED:
+        return 0
+    ttl = details.get('cache_ttl')
+    return float(ttl) if ttl is not None else GET_CACHE_DEFAULT_TTL
+
+
+get_cache = GetCache(state_backend)
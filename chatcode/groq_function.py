@@ -1,23 +1,34 @@
 import json
 import logging
 import os
-import re
-from datetime import datetime
 from typing import Any, Dict
 
 import groq
 from dotenv import load_dotenv
 from fastapi import WebSocket
-from groq import Groq
 
+from chatcode.config_registry import registry
+from chatcode.dialog_state import PROJECT_MAX_ATTEMPTS, attempts_exhausted
+from chatcode.frames import StreamWriter
 from chatcode.function import *
+from chatcode.intent_router import INTENT_ROUTER_ENABLED, intent_router
+from chatcode.llm_client import record_stream_usage
+from chatcode.llm_limiter import LLMBusy
+from chatcode.llm_router import routed_completion
+from chatcode.metrics import user_wait
+from chatcode.prompt_builder import (candidate_projects, combined_messages,
+                                     payload_messages, project_messages,
+                                     summary_messages)
+from chatcode.response_cache import (RESPONSE_CACHE_ENABLED, normalize_query,
+                                     response_cache)
 
-# Setup logging
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
 load_dotenv()
 
+# 'two_step' asks for the project and then the payload, 'combined' asks for both in one call
+CHAT_PIPELINE_MODE = os.getenv('CHAT_PIPELINE_MODE', 'two_step')
+
 
 def project_available_check(project_name, projectinfo):
     if project_name not in projectinfo.keys():
@@ -26,118 +37,142 @@ def project_available_check(project_name, projectinfo):
         return project_name
 
 
-async def get_project_details(websocket: WebSocket, query: str, jsonfile: str, apikey, model):
+async def resolve_project_locally(query: str, jsonfile: str, model, projectinfo: dict):
+    # Unambiguous queries are resolved without a model round trip
+    if INTENT_ROUTER_ENABLED and projectinfo:
+        routed = intent_router.route(jsonfile, query)
+        if routed is not None:
+            return routed
+
+    if RESPONSE_CACHE_ENABLED and projectinfo:
+        cached = await response_cache.get('project', jsonfile, model, normalize_query(query))
+        if cached is not None and cached in projectinfo:
+            return cached
+    return None
+
+
+async def get_project_details(websocket: WebSocket, query: str, jsonfile: str, apikey, model, resolve_locally=True):
     projectinfo = {}
     try:
-        with open(jsonfile, 'r') as f:
-            json_config = json.load(f)
-            project_names = json_config.keys()
-            for i in project_names:
-                if 'project description' in json_config[i]:
-                    projectinfo[i] = json_config[i]['project description']
-                else:
-                    logging.warning(
-                        f"Warning: 'project description' missing for {i}")
+        projectinfo = registry.project_info(jsonfile)
     except Exception as e:
-        print(f"Error while processing the get project details: {e}")
+        logger.error(f"Error while processing the get project details: {e}")
         await websocket.send_text("Error while processing the get project details : project info")
 
-    client = Groq(api_key=os.getenv(apikey))
+    attempts = 0
+    while True:
+        if resolve_locally:
+            local_project = await resolve_project_locally(query, jsonfile, model, projectinfo)
+            if local_project is not None:
+                return query, local_project
+        resolve_locally = True
+
+        try:
+            candidates = candidate_projects(projectinfo, query, jsonfile)
+            response = await routed_completion(
+                apikey,
+                model,
+                messages=project_messages(query, candidates),
+                stage='get_project_details'
+            )
+
+            response_text = response.choices[0].message.content.strip()
+            json_start_idx = response_text.find("~~~")
+            json_end_idx = response_text.rfind("~~~") + 1
+            result = response_text[json_start_idx:json_end_idx]
+            result = sanitize_json_string(result)
+            project_name = json.loads(result).get("project")
+            project_name = project_available_check(project_name, projectinfo)
+
+            if project_name == "None" or project_name is None:
+                attempts += 1
+                if attempts_exhausted(attempts, PROJECT_MAX_ATTEMPTS):
+                    await websocket.send_text("Sorry, I could not match your request to any of the listed projects. Please try again.")
+                    return query, None
+                await websocket.send_text("You have asked for an irrelevant query. Ask anything from the listed projects:")
+                with user_wait():
+                    user_input = await websocket.receive_text()
+                user_input_data = json.loads(user_input)
+                query = user_input_data.get("message")
+                continue
+
+            if RESPONSE_CACHE_ENABLED:
+                await response_cache.set('project', jsonfile, model, normalize_query(query), project_name)
+            return query, project_name
+
+        except LLMBusy:
+            raise
+
+        except groq.GroqError as groq_error:
+            logger.error(f"Groq API error: {groq_error}")
+            await websocket.send_text("Error: Failed to process the response from Groq API.")
+            return "query", "Groq API error"
+
+        except Exception as e:
+            logger.exception(f"Error while processing the response: {e}")
+            await websocket.send_text(e)
+            await websocket.send_text("Error: Failed to process the response on get project detail.")
+            return None
+
+
+async def get_project_and_payload(websocket: WebSocket, query: str, jsonfile: str, apikey, model):
+    # Single call returning both the project and its payload; None means use the two-step path
     try:
-        response = client.chat.completions.create(
-            model=os.getenv(model),
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"""
-                        You are an AI assistant trained to extract project names based on project descriptions. Follow these steps:
-                        
-                        1. Correct any grammatical or spelling errors in the query.
-                        2. Identify and extract keywords and context from the user query: "{query}" to capture the intent.
-                        3. Review the provided project descriptions: {projectinfo}.
-                        4. Analyze the intent and match it with the project names based on the descriptions.
-                        5. If a project name matches the query context, return that project name.
-                        6. If no project name matches or the query is unclear, return 'None'.
-                        7. Return the result in a JSON object with the format shown below.
-                        
-                        Example:
-                        Query: "How do I update my project?"
-                        Project Titles and Descriptions: {projectinfo}
-                        Response:
-                        ~~~
-                        {{
-                            "project": "Project XYZ"
-                        }}
-                        ~~~
-                    Ensure the response is enclosed with `~~~` before and after the JSON output. Do not include any additional explanations.
-            """
-                },
-                {
-                    "role": "user",
-                    "content": f"Extract the project name from the following query: {query} and Project Titles and Descriptions: {projectinfo}."
-                }
-            ]
+        config = registry.get(jsonfile)
+        candidates = candidate_projects(config.project_info, query, jsonfile)
+        response = await routed_completion(
+            apikey,
+            model,
+            messages=combined_messages(query, candidates, config.payload_schemas),
+            stage='get_project_and_payload'
         )
 
         response_text = response.choices[0].message.content.strip()
         json_start_idx = response_text.find("~~~")
         json_end_idx = response_text.rfind("~~~") + 1
-        result = response_text[json_start_idx:json_end_idx]
-        result = sanitize_json_string(result)
-        project_name = json.loads(result).get("project")
-        project_name = project_available_check(project_name, projectinfo)
-
-        if project_name == "None" or project_name is None:
-            await websocket.send_text("You have asked for an irrelevant query. Ask anything from the listed projects:")
-            user_input = await websocket.receive_text()
-            user_input_data = json.loads(user_input)
-            query = user_input_data.get("message")
-            return await get_project_details(websocket, query, jsonfile, apikey, model)
-        return query, project_name
-
-    except client.exceptions.GroqAPIError as groq_error:
-        print(f"Groq API error: {groq_error}")
-        await websocket.send_text("Error: Failed to process the response from Groq API.")
-        return "query", "Groq API error"
+        result = json.loads(sanitize_json_string(response_text[json_start_idx:json_end_idx]))
+        project_name = project_available_check(result.get("project"), config.project_info)
+        payload = result.get("payload", {})
+        if project_name is None or not isinstance(payload, dict):
+            return None
+
+        payload_details = config.payload_schemas.get(project_name, {})
+        payload = {field: payload.get(field, "None") for field in payload_details}
+        verified_payload = verify_values_from_query(query, payload, payload_details)
+
+        # Any value the model filled in that fails validation sends us back to the two-step path
+        validated = validate(config.config[project_name], verified_payload)['payload']
+        for field, value in verified_payload.items():
+            if value not in (None, "None") and validated.get(field) is None:
+                logger.info(f"Combined extraction for '{project_name}' failed validation on {field}")
+                return None
+
+        if RESPONSE_CACHE_ENABLED:
+            await response_cache.set('project', jsonfile, model, normalize_query(query), project_name)
+        return project_name, verified_payload
+
+    except LLMBusy:
+        raise
 
     except Exception as e:
-        print(f"Error while processing the response: {e}")
-        await websocket.send_text(e)
-        await websocket.send_text("Error: Failed to process the response on get project detail.")
+        logger.error(f"Error while processing the response on get_project_and_payload: {e}")
+        return None
+
 
+async def fill_payload_values(websocket: WebSocket, query: str, payload_details: dict, jsonfile, apikey, model, project_name=None) -> Dict[str, Any]:
+    # Extracted values depend on the exact wording, so only identical queries are reused
+    use_cache = RESPONSE_CACHE_ENABLED and project_name is not None
+    if use_cache:
+        cached = await response_cache.get('payload', jsonfile, model, query, project_name)
+        if cached is not None:
+            return dict(cached)
 
-async def fill_payload_values(websocket: WebSocket, query: str, payload_details: dict, jsonfile, apikey, model) -> Dict[str, Any]:
-    client = Groq(api_key=os.getenv(apikey))
     try:
-        response = client.chat.completions.create(
-            model=os.getenv(model),
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"""You are an expert in filling payload values from a user query based on a configuration file.
-
-                        Strict Instructions:
-                        1. **Capture Only from User Query:** Extract values strictly from the user query: {query}. Do **not** infer or assume any values.                        
-                        2. **Use Assigned Values:** If a value is missing in the user query or doesn't match the required format/choices, **use the assigned value** specified in the configuration file {payload_details}.        
-                        3. **Fill Missing Fields with Assigned Values:** For each field not found in the user query, refer to the configuration file for the field's assigned value. If no valid input is found in the query and no assigned value is provided, use "None".
-                        4. **JSON Response Format:** Return only the payload JSON response in the following format, enclosed with `~~~` before and after the response.
-                    
-                    Example output format:
-                        query: get leave records by month and year
-                        ~~~{{
-                            "payload": {{
-                                "employee_id": "None",
-                                "monthnumber": "None",
-                                "yearnumber": "None"
-                            }}
-                        }}~~~
-                """
-                },
-                {
-                    "role": "user",
-                    "content": f"Analyze the following query: {query} with config file: {payload_details} and extract values based on the user input or use assigned values from the config file."
-                }
-            ]
+        response = await routed_completion(
+            apikey,
+            model,
+            messages=payload_messages(query, payload_details),
+            stage='fill_payload_values'
         )
 
         response_text = response.choices[0].message.content.strip()
@@ -150,6 +185,8 @@ async def fill_payload_values(websocket: WebSocket, query: str, payload_details:
             response_config = result.get('payload', {})
             verified_payload = verify_values_from_query(
                 query, response_config, payload_details)
+            if use_cache:
+                await response_cache.set('payload', jsonfile, model, query, dict(verified_payload), project_name)
             return verified_payload
 
         except json.JSONDecodeError:
@@ -157,8 +194,11 @@ async def fill_payload_values(websocket: WebSocket, query: str, payload_details:
                 "Error: Failed to decode JSON from the response on fill_payload_values.")
             await websocket.send_text("Error: Failed to decode JSON from the response on fill_payload_values.")
 
-    except client.exceptions.GroqAPIError as groq_error:
-        print(f"Groq API error: {groq_error}")
+    except LLMBusy:
+        raise
+
+    except groq.GroqError as groq_error:
+        logger.error(f"Groq API error: {groq_error}")
         await websocket.send_text("Error: Failed to process the response from Groq API.")
         return "Groq API error"
 
@@ -171,34 +211,59 @@ async def fill_payload_values(websocket: WebSocket, query: str, payload_details:
 
 async def nlp_response(websocket: WebSocket, answer, payload, apikey, model):
     try:
-        client = Groq(api_key=os.getenv(apikey))
-        response = client.chat.completions.create(
-            model=os.getenv(model),
-            messages=[
-                {
-                    "role": "system",
-                    "content": """
-                    You are an AI assistant responsible for explaining technical SQL operation results in simple and user-friendly terms. 
-                    The user has performed a CRUD operation (Create, Read, Update, Delete) using an API that interacts with a database.
-                    
-                    Provide a concise, clear summary of the operation result in **under 40 words**. Include the relevant payload values.
-                    Avoid technical jargon and ensure the explanation is easily understandable by non-technical users.
-                    """
-                },
-                {
-                    "role": "user",
-                    "content": f"The API response is: {answer}. The payload is: {payload}. Please summarize the result in a user-friendly way."
-                }
-            ]
+        response = await routed_completion(
+            apikey,
+            model,
+            messages=summary_messages(answer, payload),
+            stage='nlp_response'
         )
         response_text = response.choices[0].message.content.strip()
         return response_text
 
-    except client.exceptions.GroqAPIError as groq_error:
-        print(f"Groq API error: {groq_error}")
+    except LLMBusy:
+        raise
+
+    except groq.GroqError as groq_error:
+        logger.error(f"Groq API error: {groq_error}")
         await websocket.send_text("Error: Failed to process the response from Groq API.")
         return "Groq API error"
 
     except Exception as e:
-        logging.error(f"Error during API call: {e}")
+        logger.error(f"Error during API call: {e}")
         await websocket.send_text(f"Error occurred in nlp_response: {e}")
+
+
+async def stream_nlp_response(websocket: WebSocket, answer, payload, apikey, model, suffix=""):
+    # Same summary as nlp_response, forwarded token by token as stream frames
+    writer = StreamWriter(websocket)
+    await writer.start()
+    try:
+        stream = await routed_completion(
+            apikey,
+            model,
+            messages=summary_messages(answer, payload),
+            stage='nlp_response',
+            stream=True
+        )
+        async for chunk in stream:
+            record_stream_usage('nlp_response', model, chunk)
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                await writer.delta(delta)
+
+        response_text = ''.join(writer.parts).strip()
+        await writer.end(f"{response_text}{suffix}")
+        return response_text
+
+    except LLMBusy:
+        await writer.end(error="busy")
+        raise
+
+    except groq.GroqError as groq_error:
+        logger.error(f"Groq API error: {groq_error}")
+        await writer.end(error="Error: Failed to process the response from Groq API.")
+        return "Groq API error"
+
+    except Exception as e:
+        logger.error(f"Error during API call: {e}")
+        await writer.end(error=f"Error occurred in nlp_response: {e}")
@@ -0,0 +1,121 @@
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from chatcode.metrics import backend_responses, backend_seconds
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+try:
+    import h2  # noqa: F401  httpx needs it for HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+BACKEND_MAX_CONNECTIONS = int(os.getenv('BACKEND_MAX_CONNECTIONS', '100'))
+BACKEND_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('BACKEND_MAX_KEEPALIVE_CONNECTIONS', '20'))
+BACKEND_KEEPALIVE_EXPIRY = float(os.getenv('BACKEND_KEEPALIVE_EXPIRY', '60'))
+BACKEND_HTTP2 = os.getenv('BACKEND_HTTP2', 'true').lower() == 'true'
+BACKEND_CONNECT_TIMEOUT = float(os.getenv('BACKEND_CONNECT_TIMEOUT', '5'))
+# Sends every backend call to another origin keeping the path, e.g. the
+# benchmark's fake backend (benchmarks/fake_backend.py); callers rebase
+# backend URLs themselves, other requests through the pool are left alone
+BACKEND_BASE_URL = os.getenv('BACKEND_BASE_URL', '')
+
+# Reads should fail fast, writes get the 30 seconds the old per-call clients used
+BACKEND_METHOD_TIMEOUTS = {
+    'GET': float(os.getenv('BACKEND_TIMEOUT_GET', '15')),
+    'POST': float(os.getenv('BACKEND_TIMEOUT_POST', '30')),
+    'PUT': float(os.getenv('BACKEND_TIMEOUT_PUT', '30')),
+    'DELETE': float(os.getenv('BACKEND_TIMEOUT_DELETE', '30')),
+}
+BACKEND_DEFAULT_TIMEOUT = 30.0
+
+
+class BackendPool:
+    # One keep-alive httpx client shared by every backend call for the app lifetime
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        # origin -> monotonic time of the last request, to skip needless warm-ups
+        self._last_used: Dict[str, float] = {}
+        self._timeouts: Dict[str, httpx.Timeout] = {
+            method: httpx.Timeout(seconds, connect=BACKEND_CONNECT_TIMEOUT)
+            for method, seconds in BACKEND_METHOD_TIMEOUTS.items()
+        }
+
+    def start(self) -> httpx.AsyncClient:
+        if self._client is None:
+            http2 = BACKEND_HTTP2 and HTTP2_AVAILABLE
+            if BACKEND_HTTP2 and not HTTP2_AVAILABLE:
+                logger.warning("BACKEND_HTTP2 is enabled but the 'h2' package is not installed, using HTTP/1.1")
+            # httpx keeps idle connections per origin, so each backend host reuses its own
+            self._client = httpx.AsyncClient(
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=BACKEND_MAX_CONNECTIONS,
+                    max_keepalive_connections=BACKEND_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=BACKEND_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(BACKEND_DEFAULT_TIMEOUT, connect=BACKEND_CONNECT_TIMEOUT),
+            )
+        return self._client
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Started by the app lifespan, lazily otherwise (scripts, tests)
+        return self._client or self.start()
+
+    def timeout(self, method: str) -> httpx.Timeout:
+        return self._timeouts.get(method.upper(), self.client.timeout)
+
+    def rebase(self, url: str) -> str:
+        if not BACKEND_BASE_URL:
+            return url
+        base = httpx.URL(BACKEND_BASE_URL)
+        return str(httpx.URL(url).copy_with(scheme=base.scheme, host=base.host, port=base.port))
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        method = method.upper()
+        kwargs.setdefault('timeout', self.timeout(method))
+        self._last_used[self.origin(url)] = time.monotonic()
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            backend_responses.inc(method=method, status=type(e).__name__)
+            raise
+        finally:
+            backend_seconds.observe(time.perf_counter() - started, method=method)
+        backend_responses.inc(method=method, status=str(response.status_code))
+        return response
+
+    def origin(self, url: str) -> str:
+        parsed = httpx.URL(url)
+        return str(parsed.copy_with(path='/', query=None, fragment=None))
+
+    async def warm(self, url: str):
+        # Opens (or keeps alive) a connection to the URL's origin ahead of a
+        # write, so the write itself skips the TCP/TLS handshake
+        origin = self.origin(url)
+        last_used = self._last_used.get(origin)
+        if last_used is not None and time.monotonic() - last_used < BACKEND_KEEPALIVE_EXPIRY / 2:
+            return
+        self._last_used[origin] = time.monotonic()
+        try:
+            await self.client.request('HEAD', origin, timeout=self.timeout('GET'))
+        except httpx.HTTPError as e:
+            logger.debug(f"Warm-up of {origin} failed: {e}")
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+backend_pool = BackendPool()
@@ -0,0 +1,159 @@
+import logging
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from chatcode.config_registry import registry, role_key
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+INTENT_ROUTER_ENABLED = os.getenv('INTENT_ROUTER_ENABLED', 'true').lower() == 'true'
+# Minimum cosine similarity of the best project and its lead over the runner-up
+INTENT_ROUTER_THRESHOLD = float(os.getenv('INTENT_ROUTER_THRESHOLD', '0.45'))
+INTENT_ROUTER_MARGIN = float(os.getenv('INTENT_ROUTER_MARGIN', '0.15'))
+
+STOPWORDS = {
+    'a', 'an', 'the', 'my', 'me', 'i', 'for', 'of', 'to', 'by', 'with', 'and', 'or',
+    'on', 'in', 'is', 'are', 'please', 'want', 'need', 'can', 'you', 'could', 'would',
+    'provided', 'all', 'some', 'this', 'that',
+    'do', 'how', 'what', 'which', 'be', 'it', 'from', 'about', 'based',
+}
+
+SYNONYMS = {
+    'retrieve': 'get', 'show': 'get', 'view': 'get', 'see': 'get', 'list': 'get',
+    'display': 'get', 'fetch': 'get', 'read': 'get', 'check': 'get', 'give': 'get',
+    'modify': 'update', 'change': 'update', 'edit': 'update', 'approve': 'approving',
+    'remove': 'delete', 'add': 'create', 'calendar': 'calender', 'request': 'apply',
+}
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for word in re.findall(r'[a-z]+', text.lower()):
+        if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us')):
+            word = word[:-1]
+        word = SYNONYMS.get(word, word)
+        if word not in STOPWORDS:
+            tokens.append(word)
+    return tokens
+
+
+def features(text: str) -> Counter:
+    tokens = tokenize(text)
+    grams = Counter(tokens)
+    grams.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    return grams
+
+
+class RoleIndex:
+    def __init__(self, projectinfo: Dict[str, str]):
+        documents = {}
+        for name, description in projectinfo.items():
+            # Names are counted once: doubling them made bigrams like "create role"
+            # exclusive to the longest name that happens to contain them
+            documents[name] = features(f"{name} {description}")
+
+        document_count = len(documents)
+        frequency = Counter()
+        for grams in documents.values():
+            frequency.update(grams.keys())
+        self.idf = {gram: math.log((1 + document_count) / (1 + count)) + 1
+                    for gram, count in frequency.items()}
+        self.vectors = {name: self._weigh(grams) for name, grams in documents.items()}
+        # Queries that are just a project name (in any word order) need no scoring
+        self.names = {frozenset(tokenize(name)): name for name in projectinfo}
+
+    def exact(self, query: str) -> Optional[str]:
+        return self.names.get(frozenset(tokenize(query)))
+
+    def ambiguous(self, query: str) -> bool:
+        # "create role" is part of both "create new role" and "create role
+        # function"; a query every word of which fits several names is the
+        # LLM's call, however the scores come out
+        tokens = set(tokenize(query))
+        return bool(tokens) and sum(tokens <= name for name in self.names) > 1
+
+    def _weigh(self, grams: Counter) -> Dict[str, float]:
+        vector = {gram: count * self.idf[gram] for gram, count in grams.items() if gram in self.idf}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        if norm == 0:
+            return {}
+        return {gram: weight / norm for gram, weight in vector.items()}
+
+    def rank(self, query: str) -> List[Tuple[str, float]]:
+        query_vector = self._weigh(features(query))
+        if not query_vector:
+            return []
+        scores = []
+        for name, vector in self.vectors.items():
+            score = sum(weight * vector.get(gram, 0.0) for gram, weight in query_vector.items())
+            scores.append((name, score))
+        scores.sort(key=lambda item: item[1], reverse=True)
+        return scores
+
+
+class IntentRouter:
+    def __init__(self, threshold: float = INTENT_ROUTER_THRESHOLD, margin: float = INTENT_ROUTER_MARGIN):
+        self.threshold = threshold
+        self.margin = margin
+        self._indexes: Dict[str, Tuple[int, RoleIndex]] = {}
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def _index(self, role: str) -> RoleIndex:
+        # Rebuilt lazily whenever the registry has reloaded the role file
+        config = registry.get(role)
+        cached = self._indexes.get(config.role)
+        if cached is None or cached[0] != config.version:
+            cached = (config.version, RoleIndex(config.project_info))
+            self._indexes[config.role] = cached
+        return cached[1]
+
+    def rank(self, role: str, query: str) -> List[Tuple[str, float]]:
+        return self._index(role).rank(query)
+
+    def matches(self, role: str, query: str) -> Optional[str]:
+        # The project route() would pick, without counting a hit or miss
+        index = self._index(role_key(role))
+        exact = index.exact(query)
+        if exact is not None:
+            return exact
+        if index.ambiguous(query):
+            return None
+
+        ranked = index.rank(query)
+        best, best_score = ranked[0] if ranked else (None, 0.0)
+        runner_up_score = ranked[1][1] if len(ranked) > 1 else 0.0
+        if best is not None and best_score >= self.threshold and best_score - runner_up_score >= self.margin:
+            return best
+        return None
+
+    def route(self, role: str, query: str) -> Optional[str]:
+        role = role_key(role)
+        project = self.matches(role, query)
+        if project is None:
+            self.misses[role] += 1
+            return None
+        self.hits[role] += 1
+        logger.info(f"Intent router matched '{query}' to '{project}'")
+        return project
+
+    def stats(self) -> Dict[str, dict]:
+        stats = {}
+        for role in set(self.hits) | set(self.misses):
+            hits, misses = self.hits[role], self.misses[role]
+            stats[role] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            }
+        return stats
+
+
+intent_router = IntentRouter()
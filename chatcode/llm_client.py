@@ -0,0 +1,82 @@
+import logging
+import os
+from typing import Any, Dict, List
+
+import httpx
+from dotenv import load_dotenv
+from groq import AsyncGroq, GroqError
+
+from chatcode.llm_limiter import llm_limiter
+from chatcode.metrics import llm_requests, record_llm_usage
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Connection pool settings shared by every chat socket using the same key
+LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', '200'))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('LLM_MAX_KEEPALIVE_CONNECTIONS', '50'))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv('LLM_KEEPALIVE_EXPIRY', '30'))
+LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', '60'))
+# Retries and fallbacks are handled per stage in chatcode/llm_router.py
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '0'))
+
+# One AsyncGroq client (and so one pooled httpx client) per resolved API key
+_clients: Dict[str, AsyncGroq] = {}
+
+
+def get_llm_client(apikey: str) -> AsyncGroq:
+    # `apikey` is the env variable name sent by the frontend, not the key itself;
+    # an unset one falls back to GROQ_API_KEY as AsyncGroq would
+    api_key = os.getenv(apikey) or os.getenv('GROQ_API_KEY')
+    client = _clients.get(api_key)
+    if client is None:
+        if not api_key:
+            # Checked before the pooled httpx client exists, which would otherwise leak
+            raise GroqError(f"No API key found for '{apikey}' and GROQ_API_KEY is not set")
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS),
+        )
+        client = AsyncGroq(api_key=api_key, http_client=http_client,
+                           max_retries=LLM_MAX_RETRIES)
+        _clients[api_key] = client
+        logger.info(f"Created pooled LLM client for key '{apikey}'")
+    return client
+
+
+async def chat_completion(apikey: str, model: str, messages: List[Dict[str, str]], stage: str = 'llm', **kwargs: Any):
+    client = get_llm_client(apikey)
+    model_name = os.getenv(model)
+    # Queues fairly behind other sockets using this key, or raises LLMBusy.
+    # A stream gives its slot back once the response has started.
+    async with llm_limiter.slot(apikey):
+        llm_requests.inc(stage=stage, model=model_name)
+        response = await client.chat.completions.create(
+            model=model_name,
+            messages=messages,
+            **kwargs
+        )
+    if not kwargs.get('stream'):
+        # Streams report usage on their last chunk, see record_stream_usage
+        record_llm_usage(stage, model_name, getattr(response, 'usage', None))
+    return response
+
+
+def record_stream_usage(stage: str, model: str, chunk):
+    # Groq attaches usage to the final chunk under x_groq
+    x_groq = getattr(chunk, 'x_groq', None)
+    usage = getattr(x_groq, 'usage', None) if x_groq is not None else None
+    if usage is not None:
+        record_llm_usage(stage, os.getenv(model), usage)
+
+
+async def close_llm_clients():
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.close()
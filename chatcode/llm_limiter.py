@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+from dotenv import load_dotenv
+
+from chatcode.metrics import Counter, Gauge, Histogram
+from chatcode.shared_state import StateBackend, state_backend
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+LLM_LIMITER_ENABLED = os.getenv('LLM_LIMITER_ENABLED', 'true').lower() == 'true'
+# Token bucket per API key: sustained requests per second and burst size
+LLM_RATE_PER_SECOND = float(os.getenv('LLM_RATE_PER_SECOND', '5'))
+LLM_BURST = float(os.getenv('LLM_BURST', '10'))
+# Requests per key allowed to be waiting on Groq at the same time
+LLM_MAX_IN_FLIGHT = int(os.getenv('LLM_MAX_IN_FLIGHT', '8'))
+# Longest a call may queue before the client gets a "busy" frame
+LLM_MAX_WAIT = float(os.getenv('LLM_MAX_WAIT', '10'))
+# Optional cap shared by every worker through the state backend, 0 disables it
+LLM_SHARED_RATE_PER_MINUTE = int(os.getenv('LLM_SHARED_RATE_PER_MINUTE', '0'))
+
+queue_depth = Gauge('llm_limiter_queue_depth', 'LLM calls waiting for a slot, per API key.')
+in_flight = Gauge('llm_limiter_in_flight', 'LLM calls currently holding a slot, per API key.')
+wait_seconds = Histogram('llm_limiter_wait_seconds', 'Time LLM calls waited for a slot.')
+rejected = Counter('llm_limiter_rejected_total', 'LLM calls turned away after waiting LLM_MAX_WAIT.')
+
+
+class LLMBusy(Exception):
+    # Raised instead of queueing past LLM_MAX_WAIT; handlers answer with a busy frame
+    def __init__(self, apikey: str, retry_after: float):
+        super().__init__(f"LLM key '{apikey}' is busy, retry in {retry_after:.1f}s")
+        self.apikey = apikey
+        self.retry_after = retry_after
+
+
+class KeyLimiter:
+    # Token bucket plus in-flight cap for one key. Waiters are served strictly
+    # in arrival order, so a burst from one socket cannot starve the others.
+    def __init__(self, name: str, rate: float, burst: float, max_in_flight: int):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _can_take(self) -> bool:
+        self._refill()
+        return self.in_flight < self.max_in_flight and self.tokens >= 1
+
+    def _take(self):
+        self.tokens -= 1
+        self.in_flight += 1
+        in_flight.set(self.in_flight, key=self.name)
+
+    def _wake(self):
+        self._timer = None
+        while self.waiters:
+            if self.waiters[0].done():
+                # Timed out or cancelled while queued
+                self.waiters.popleft()
+                continue
+            if not self._can_take():
+                break
+            self._take()
+            self.waiters.popleft().set_result(None)
+        queue_depth.set(sum(1 for waiter in self.waiters if not waiter.done()), key=self.name)
+        if self.waiters and self.in_flight < self.max_in_flight and self._timer is None:
+            # Out of tokens rather than slots: try again when the next one is due
+            delay = max(0.0, (1 - self.tokens) / self.rate) if self.rate > 0 else 1.0
+            self._timer = asyncio.get_running_loop().call_later(delay, self._wake)
+
+    async def acquire(self, max_wait: float):
+        started = time.monotonic()
+        if not self.waiters and self._can_take():
+            self._take()
+            wait_seconds.observe(0.0)
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self._wake()
+        try:
+            await asyncio.wait_for(waiter, max_wait)
+        except asyncio.TimeoutError:
+            # _wake() may have granted the slot as the deadline passed (refill
+            # timer and timeout due together); then the caller keeps it
+            if not waiter.done() or waiter.cancelled():
+                rejected.inc(key=self.name)
+                raise LLMBusy(self.name, self.retry_after()) from None
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as the caller went away, hand the slot on
+                self.release()
+            raise
+        finally:
+            if waiter in self.waiters:
+                # Abandoned waiters would otherwise count towards retry_after()
+                # and keep later callers off the fast path until the next _wake()
+                self.waiters.remove(waiter)
+                self._wake()
+            queue_depth.set(sum(1 for waiter in self.waiters if not waiter.done()), key=self.name)
+        wait_seconds.observe(time.monotonic() - started)
+
+    def release(self):
+        self.in_flight -= 1
+        in_flight.set(self.in_flight, key=self.name)
+        self._wake()
+
+    def retry_after(self) -> float:
+        # Rough time until the queue ahead of a new caller has drained
+        if self.rate <= 0:
+            return 1.0
+        return max(1.0, math.ceil((len(self.waiters) + 1 - self.tokens) / self.rate))
+
+
+class LLMLimiter:
+    NAMESPACE = 'llm_rate'
+
+    def __init__(self, backend: StateBackend, rate: float = LLM_RATE_PER_SECOND, burst: float = LLM_BURST,
+                 max_in_flight: int = LLM_MAX_IN_FLIGHT, max_wait: float = LLM_MAX_WAIT,
+                 shared_per_minute: int = LLM_SHARED_RATE_PER_MINUTE):
+        self.backend = backend
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.max_wait = max_wait
+        self.shared_per_minute = shared_per_minute
+        self._keys: Dict[str, KeyLimiter] = {}
+
+    def limiter(self, apikey: str) -> KeyLimiter:
+        # Keyed on the env variable name the frontend sends, never the key itself
+        limiter = self._keys.get(apikey)
+        if limiter is None:
+            limiter = self._keys[apikey] = KeyLimiter(apikey, self.rate, self.burst, self.max_in_flight)
+        return limiter
+
+    async def _check_shared(self, apikey: str, deadline: float):
+        while True:
+            now = time.time()
+            window = int(now // 60)
+            count = await self.backend.incr(self.NAMESPACE, f"{apikey}:{window}", 1, 120)
+            if count <= self.shared_per_minute:
+                return
+            retry_after = (window + 1) * 60 - now
+            if time.monotonic() + retry_after > deadline:
+                rejected.inc(key=apikey)
+                raise LLMBusy(apikey, retry_after)
+            await asyncio.sleep(retry_after)
+
+    @asynccontextmanager
+    async def slot(self, apikey: str):
+        if not LLM_LIMITER_ENABLED:
+            yield
+            return
+        deadline = time.monotonic() + self.max_wait
+        limiter = self.limiter(apikey)
+        await limiter.acquire(self.max_wait)
+        try:
+            if self.shared_per_minute > 0:
+                await self._check_shared(apikey, deadline)
+            yield
+        finally:
+            limiter.release()
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            name: {'in_flight': limiter.in_flight, 'queued': len(limiter.waiters), 'tokens': round(limiter.tokens, 2)}
+            for name, limiter in self._keys.items()
+        }
+
+
+llm_limiter = LLMLimiter(state_backend)
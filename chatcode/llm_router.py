@@ -0,0 +1,164 @@
+import asyncio
+import json
+import logging
+import os
+import random
+from collections import deque
+from typing import Any, Deque, Dict, List, Tuple
+
+import groq
+from dotenv import load_dotenv
+
+from chatcode.llm_client import chat_completion
+from chatcode.llm_limiter import LLMBusy
+from chatcode.metrics import Counter
+from chatcode.single_flight import llm_flight
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Fallback routes tried after the model/apikey the frontend sent, as comma
+# separated env variable names "MODEL_ENV" or "MODEL_ENV@APIKEY_ENV".
+# LLM_FALLBACKS applies to every stage, LLM_FALLBACKS_<STAGE> (e.g.
+# LLM_FALLBACKS_FILL_PAYLOAD_VALUES) replaces it for one stage.
+LLM_FALLBACKS = os.getenv('LLM_FALLBACKS', '')
+# Tries per route before moving on to the next one
+LLM_ROUTE_ATTEMPTS = int(os.getenv('LLM_ROUTE_ATTEMPTS', '2'))
+# Jittered exponential backoff between tries: base * 2**n, scaled by 0.5-1.5
+LLM_RETRY_BACKOFF = float(os.getenv('LLM_RETRY_BACKOFF', '0.25'))
+LLM_RETRY_BACKOFF_MAX = float(os.getenv('LLM_RETRY_BACKOFF_MAX', '4'))
+# Stages that fire a second request when the first is slower than the
+# LLM_HEDGE_PERCENTILE of recent calls, e.g. "get_project_details,fill_payload_values"
+LLM_HEDGE_STAGES = frozenset(stage.strip() for stage in os.getenv('LLM_HEDGE_STAGES', '').split(',') if stage.strip())
+LLM_HEDGE_PERCENTILE = float(os.getenv('LLM_HEDGE_PERCENTILE', '0.95'))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '20'))
+# Hedge delay used until enough samples exist, and the floor afterwards
+LLM_HEDGE_MIN_DELAY = float(os.getenv('LLM_HEDGE_MIN_DELAY', '1.0'))
+
+# Errors worth another try; bad requests and auth failures go straight to the next route
+RETRYABLE_ERRORS = (groq.APIConnectionError, groq.RateLimitError, groq.InternalServerError)
+
+llm_retries = Counter('llm_retries_total', 'LLM calls retried or moved to a fallback route.')
+llm_hedges = Counter('llm_hedges_total', 'Hedged LLM requests fired, by which request won.')
+
+Route = Tuple[str, str]
+
+
+def parse_routes(spec: str, apikey: str) -> List[Route]:
+    routes = []
+    for entry in spec.split(','):
+        model, _, key = entry.strip().partition('@')
+        if model:
+            routes.append((model, key or apikey))
+    return routes
+
+
+def stage_routes(stage: str, apikey: str, model: str) -> List[Route]:
+    spec = os.getenv(f"LLM_FALLBACKS_{stage.upper()}", LLM_FALLBACKS)
+    routes = [(model, apikey)]
+    for route in parse_routes(spec, apikey):
+        if route not in routes:
+            routes.append(route)
+    return routes
+
+
+def backoff(attempt: int) -> float:
+    return min(LLM_RETRY_BACKOFF_MAX, LLM_RETRY_BACKOFF * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+class LatencyTracker:
+    # Recent latencies per (stage, model) to decide when a request is slow enough to hedge
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+
+    def observe(self, stage: str, model: str, seconds: float):
+        self._samples.setdefault((stage, model), deque(maxlen=self.window)).append(seconds)
+
+    def hedge_delay(self, stage: str, model: str) -> float:
+        samples = self._samples.get((stage, model))
+        if not samples or len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_MIN_DELAY
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(LLM_HEDGE_PERCENTILE * len(ordered)))
+        return max(LLM_HEDGE_MIN_DELAY, ordered[index])
+
+
+latency_tracker = LatencyTracker()
+
+
+async def _timed_completion(route: Route, messages, stage: str, **kwargs):
+    model, apikey = route
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    response = await chat_completion(apikey, model, messages, stage=stage, **kwargs)
+    latency_tracker.observe(stage, model, loop.time() - started)
+    return response
+
+
+async def _hedged_completion(primary: Route, backup: Route, messages, stage: str, **kwargs):
+    # Start the backup once the primary is slower than usual; first success wins
+    first = asyncio.create_task(_timed_completion(primary, messages, stage, **kwargs))
+    second = None
+    try:
+        await asyncio.wait({first}, timeout=latency_tracker.hedge_delay(stage, primary[0]))
+        if not first.done():
+            second = asyncio.create_task(_timed_completion(backup, messages, stage, **kwargs))
+        pending = {first} if second is None else {first, second}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if second is not None:
+                        llm_hedges.inc(stage=stage, winner='primary' if task is first else 'hedge')
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in (first, second):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+async def routed_completion(apikey: str, model: str, messages: List[Dict[str, str]], stage: str = 'llm', **kwargs: Any):
+    if kwargs.get('stream'):
+        return await _route_completion(apikey, model, messages, stage, **kwargs)
+    # Prompts carry no credentials, so identical ones share a call across users
+    key = (stage, apikey, model, json.dumps(messages, sort_keys=True), json.dumps(kwargs, sort_keys=True))
+    return await llm_flight.do(key, lambda: _route_completion(apikey, model, messages, stage, **kwargs))
+
+
+async def _route_completion(apikey: str, model: str, messages: List[Dict[str, str]], stage: str, **kwargs: Any):
+    # chat_completion over the stage's ordered routes with retries, backoff and
+    # optional hedging; raises the last error once every route has failed
+    routes = stage_routes(stage, apikey, model)
+    hedge = stage in LLM_HEDGE_STAGES and not kwargs.get('stream')
+    attempt = 0
+    last_error = None
+    for index, route in enumerate(routes):
+        for _ in range(max(1, LLM_ROUTE_ATTEMPTS)):
+            if attempt:
+                await asyncio.sleep(backoff(attempt - 1))
+            attempt += 1
+            try:
+                if hedge:
+                    backup = routes[index + 1] if index + 1 < len(routes) else route
+                    return await _hedged_completion(route, backup, messages, stage, **kwargs)
+                return await _timed_completion(route, messages, stage, **kwargs)
+            except LLMBusy as busy:
+                # This key's queue is full; another key may have room
+                last_error = busy
+                llm_retries.inc(stage=stage, reason='busy')
+                break
+            except RETRYABLE_ERRORS as e:
+                last_error = e
+                llm_retries.inc(stage=stage, reason=type(e).__name__)
+                logger.warning(f"{stage} call to {route[0]} failed ({type(e).__name__}), retrying")
+            except groq.GroqError as e:
+                last_error = e
+                llm_retries.inc(stage=stage, reason=type(e).__name__)
+                logger.warning(f"{stage} call to {route[0]} failed ({e}), trying the next route")
+                break
+    raise last_error
@@ -0,0 +1,143 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+
+from chatcode.metrics import TraceIdFilter
+
+load_dotenv()
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# Per-module overrides, e.g. "chatcode.function=DEBUG,main=DEBUG,httpx=WARNING"
+LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+# 'json' emits one JSON object per line, 'text' is the old human readable format
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+LOG_REDACT_KEYS = frozenset(
+    key.strip().lower() for key in
+    os.getenv('LOG_REDACT_KEYS', 'token,bearer_token,password,apikey,api_key,authorization').split(',')
+    if key.strip())
+
+REDACTED = '***'
+
+_BEARER_RE = re.compile(r'(?i)(bearer\s+)[\w\-.~+/]+=*')
+_KEY_VALUE_RE = re.compile(
+    r"""(['"](?:%s)['"]\s*:\s*)(['"])[^'"]*\2""" % '|'.join(re.escape(key) for key in sorted(LOG_REDACT_KEYS)),
+    re.IGNORECASE) if LOG_REDACT_KEYS else None
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'trace_id', 'asctime'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def redact(value: Any) -> Any:
+    # Copy of dicts/lists with secret-looking keys masked; other values pass through
+    if isinstance(value, dict):
+        return {key: REDACTED if str(key).lower() in LOG_REDACT_KEYS else redact(item)
+                for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(redact(item) for item in value)
+    return value
+
+
+def redact_text(text: str) -> str:
+    text = _BEARER_RE.sub(r'\1' + REDACTED, text)
+    if _KEY_VALUE_RE is not None:
+        text = _KEY_VALUE_RE.sub(r'\1\2' + REDACTED + r'\2', text)
+    return text
+
+
+class RedactFilter(logging.Filter):
+    # Runs only for records that pass the level check, so disabled debug
+    # lines never pay for walking their payloads
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.args, dict):
+            record.args = redact(record.args)
+        elif record.args:
+            record.args = tuple(redact(arg) for arg in record.args)
+        record.msg = redact_text(record.getMessage())
+        record.args = None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'trace_id': getattr(record, 'trace_id', '-'),
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = redact(value)
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    # Never block the event loop: when the writer thread falls behind, drop the line
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def _parse_levels(spec: str):
+    for item in spec.split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            yield name.strip(), level.strip().upper()
+
+
+def setup_logging():
+    # Callers only pay for a queue put; formatting and stdout writes happen on
+    # the listener thread
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler()
+    if LOG_FORMAT == 'json':
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(levelname)s:%(name)s:[%(trace_id)s] %(message)s"))
+
+    handler = _QueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    # Both filters must run on the caller side: the trace id lives in the
+    # caller's context and the raw payload args must not reach the queue
+    handler.addFilter(TraceIdFilter())
+    handler.addFilter(RedactFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    for name, level in _parse_levels(LOG_LEVELS):
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    # Flushes whatever is still queued
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from chatcode.metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+LOOP_MONITOR_ENABLED = os.getenv('LOOP_MONITOR_ENABLED', 'true').lower() == 'true'
+# How often the heartbeat coroutine wakes up
+LOOP_MONITOR_INTERVAL = float(os.getenv('LOOP_MONITOR_INTERVAL', '0.1'))
+# A loop that has not ticked for this long is considered blocked and sampled
+LOOP_STALL_THRESHOLD = float(os.getenv('LOOP_STALL_THRESHOLD', '0.25'))
+# At most one stack sample per this many seconds, so a sick loop cannot flood the logs
+LOOP_STALL_LOG_COOLDOWN = float(os.getenv('LOOP_STALL_LOG_COOLDOWN', '10'))
+
+# Frames from these paths are what we care about; the rest is library code
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+loop_lag = Histogram('event_loop_lag_seconds', 'Delay between a scheduled heartbeat and when it ran.',
+                     buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+loop_lag_last = Gauge('event_loop_lag_last_seconds', 'Most recent event-loop lag sample.')
+loop_stalls = Counter('event_loop_stalls_total', 'Times the event loop was blocked past LOOP_STALL_THRESHOLD.')
+
+
+def is_app_frame(filename: str) -> bool:
+    path = os.path.abspath(filename)
+    return path.startswith(APP_ROOT) and f"{os.sep}site-packages{os.sep}" not in path
+
+
+class LoopMonitor:
+    # A heartbeat coroutine measures lag; a watchdog thread notices when the
+    # heartbeat stops and samples the loop thread's stack while it is still
+    # blocked, which is the only moment the culprit is visible
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL, threshold: float = LOOP_STALL_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._last_tick = time.monotonic()
+        self._last_logged = 0.0
+
+    def start(self):
+        if not LOOP_MONITOR_ENABLED or self._heartbeat_task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stopped.clear()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join, self.interval * 2)
+            self._watchdog = None
+
+    async def _heartbeat(self):
+        while True:
+            scheduled = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - scheduled - self.interval)
+            self._last_tick = now
+            loop_lag.observe(lag)
+            loop_lag_last.set(lag)
+
+    def _watch(self):
+        stalled = False
+        while not self._stopped.wait(self.interval):
+            blocked_for = time.monotonic() - self._last_tick - self.interval
+            if blocked_for < self.threshold:
+                stalled = False
+                continue
+            if stalled:
+                # Same stall as the last check, already counted
+                continue
+            stalled = True
+            loop_stalls.inc()
+            now = time.monotonic()
+            if now - self._last_logged >= LOOP_STALL_LOG_COOLDOWN:
+                self._last_logged = now
+                self._log_stack(blocked_for)
+
+    def _log_stack(self, blocked_for: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        stack = traceback.extract_stack(frame)
+        app_frames = [entry for entry in stack if is_app_frame(entry.filename)]
+        culprit = app_frames[-1] if app_frames else stack[-1]
+        task = asyncio.current_task(self._loop)
+        task_name = task.get_name() if task is not None else '-'
+        logger.warning(
+            f"Event loop blocked for at least {blocked_for * 1000:.0f} ms in task {task_name} at "
+            f"{os.path.relpath(culprit.filename, APP_ROOT)}:{culprit.lineno} ({culprit.name})\n"
+            + ''.join(traceback.format_list(app_frames or stack[-10:])))
+
+
+loop_monitor = LoopMonitor()
@@ -0,0 +1,212 @@
+import contextvars
+import logging
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+# Per-turn trace id, visible to every coroutine the turn awaits
+trace_id_var: contextvars.ContextVar = contextvars.ContextVar('trace_id', default='-')
+# Spans open in the current task, so user_wait() can take its time out of them
+_open_spans: contextvars.ContextVar = contextvars.ContextVar('open_spans', default=())
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    body = ','.join(f'{name}="{_escape(value)}"' for name, value in pairs)
+    return '{' + body + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        METRICS.append(self)
+
+    def samples(self) -> Iterable[str]:
+        return []
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}', *self.samples()]
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for key, value in self._values.items():
+            yield f'{self.name}{_format_labels(key)} {_format_value(value)}'
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels):
+        self._values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> Iterable[str]:
+        for key, value in self._values.items():
+            yield f'{self.name}{_format_labels(key)} {_format_value(value)}'
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label key -> (bucket counts, sum, count)
+        self._values: Dict[LabelKey, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry[0][index] += 1
+                break
+        entry[1] += value
+        entry[2] += 1
+
+    def samples(self) -> Iterable[str]:
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket{_format_labels(key, ("le", _format_value(bound)))} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(key)} {_format_value(total)}'
+            yield f'{self.name}_count{_format_labels(key)} {count}'
+
+
+class CallbackMetric(Metric):
+    # Values read at scrape time from another component's own counters
+    def __init__(self, name: str, help_text: str, metric_type: str,
+                 callback: Callable[[], Iterable[Tuple[Dict[str, str], float]]]):
+        super().__init__(name, help_text)
+        self.type = metric_type
+        self.callback = callback
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.callback():
+            yield f'{self.name}{_format_labels(_label_key(labels))} {_format_value(value)}'
+
+
+METRICS: List[Metric] = []
+
+stage_seconds = Histogram('chat_stage_seconds', 'Time spent in each chat pipeline stage.')
+stage_errors = Counter('chat_stage_errors_total', 'Chat pipeline stages that raised.')
+chat_turns = Counter('chat_turns_total', 'Chat turns received on /ws/chat.')
+llm_tokens = Counter('llm_tokens_total', 'LLM tokens reported in the Groq usage field.')
+llm_requests = Counter('llm_requests_total', 'LLM completion requests.')
+backend_responses = Counter('backend_responses_total', 'Backend HTTP responses by method and status code.')
+backend_seconds = Histogram('backend_request_seconds', 'Backend HTTP request latency.')
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def new_trace() -> str:
+    trace_id = uuid4().hex[:16]
+    trace_id_var.set(trace_id)
+    return trace_id
+
+
+class TraceIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id_var.get()
+        return True
+
+
+class span:
+    # with span('fill_payload_values'): ...  records the stage duration,
+    # less any time spent in user_wait() inside it
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.started = 0.0
+        self.waited = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.waited = 0.0
+        self._token = _open_spans.set(_open_spans.get() + (self,))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _open_spans.reset(self._token)
+        elapsed = time.perf_counter() - self.started - self.waited
+        stage_seconds.observe(elapsed, stage=self.stage)
+        if exc_type is not None:
+            stage_errors.inc(stage=self.stage)
+        logger.info(f"span stage={self.stage} ms={elapsed * 1000:.1f} ok={exc_type is None}")
+        return False
+
+
+class user_wait:
+    # with user_wait(): await websocket.receive_text()  keeps the user's think
+    # time out of the enclosing spans and records it as its own stage
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        for open_span in _open_spans.get():
+            open_span.waited += elapsed
+        stage_seconds.observe(elapsed, stage='user_wait')
+        return False
+
+
+def record_llm_usage(stage: str, model: str, usage):
+    if usage is None:
+        return
+    llm_tokens.inc(getattr(usage, 'prompt_tokens', 0) or 0, stage=stage, model=model, kind='prompt')
+    llm_tokens.inc(getattr(usage, 'completion_tokens', 0) or 0, stage=stage, model=model, kind='completion')
@@ -1,5 +1,6 @@
 import asyncio
 import json
+import logging
 from datetime import date, datetime
 
 import httpx
@@ -7,39 +8,39 @@ import requests
 from fastapi import WebSocket
 
 from chatcode.function import *
+from chatcode.http_pool import backend_pool
+
+logger = logging.getLogger(__name__)
 
 
 async def onboard_personal_details(websocket: WebSocket, details: dict):
-    url = 'http://127.0.0.1:8000/personal/employees'
-    print(details)
-    print(type(details))
+    url = backend_pool.rebase('http://127.0.0.1:8000/personal/employees')
+    logger.debug("Onboarding payload: %s", details)
     payload = details
-    timeout_seconds = 30  # Timeout in seconds
 
     try:
-        # Initialize HTTP client with timeout
-        async with httpx.AsyncClient(timeout=timeout_seconds) as client:
-            response = await client.post(url, json=payload)
-            response.raise_for_status()
-            response_data = response.json()
-            response_data = response_data.get('detail')
+        # Shared keep-alive client, per-method timeout comes from the pool
+        response = await backend_pool.request("POST", url, json=payload)
+        response.raise_for_status()
+        response_data = response.json()
+        response_data = response_data.get('detail')
 
-            return response_data
+        return response_data
 
     except httpx.HTTPStatusError as e:
         # Include response text in error message for better diagnostics
         error_message = f"HTTP error occurred: {str(e)} - Status Code: {e.response.status_code}"
-        print("S", error_message)
+        logger.error(error_message)
         return error_message
 
     except httpx.RequestError as e:
         # General request error handling
         error_message = f"Request error occurred: {str(e)}"
-        print("R", error_message)
+        logger.error(error_message)
         return error_message
 
     except Exception as e:
         # Catch all other unexpected errors
         error_message = f"An unexpected error occurred: {str(e)}"
-        print('E', error_message)
+        logger.exception(error_message)
         return error_message
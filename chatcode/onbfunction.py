@@ -1,4 +1,3 @@
-import os
 import datetime
 import json
 import logging
@@ -6,24 +5,19 @@ import re
 
 from fastapi import WebSocket
 
+from chatcode.config_registry import registry
+
 logger = logging.getLogger(__name__)
 
 
 def get_jsonfile():
-    # Get the directory where the current script is located
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-
-    # Construct the absolute path to the onboard.json file
-    file_path = os.path.join(script_dir, 'onboard.json')
-
-    with open(file_path, 'r') as f:
-        jsonfile = json.load(f)
-        return jsonfile
+    # Onboarding field config is loaded once and served from the registry
+    return registry.get('onboard').config
 
 
 def validate_input(field, value, datatype):
-    logger.info(
-        f"Validating {field} with value: '{value}' and datatype: {datatype}")
+    # Values are the user's personal details, only field names are logged
+    logger.debug("Validating %s as %s", field, datatype)
 
     if datatype == "string":
         return isinstance(value, str) and len(value.strip()) > 0
@@ -58,7 +52,7 @@ def validate_input(field, value, datatype):
                 return True
             except ValueError:
                 continue
-        logger.warning(f"Date validation failed for value: '{value}'")
+        logger.debug("Date validation failed for %s", field)
         return False
 
     elif datatype == "integer":
@@ -107,7 +101,7 @@ async def collect_user_input(websocket: WebSocket, jsonfile, validate_input):
                 user_input_json = await websocket.receive_text()
                 user_input_data = json.loads(user_input_json)
                 user_input = user_input_data.get("message", "").strip()
-                logger.info(f"Received user input: '{user_input}'")
+                logger.debug("Received user input for %s", field)
             except Exception as e:
                 logger.error(f"Error receiving input: {e}")
                 await websocket.send_text("Error receiving input. Please try again.")
@@ -124,5 +118,5 @@ async def collect_user_input(websocket: WebSocket, jsonfile, validate_input):
                 await websocket.send_text(error_message)
                 logger.info(error_message)
 
-    logger.info(f"Collected Information: {res}")
+    logger.debug("Collected onboarding fields: %s", list(res))
     return res
@@ -0,0 +1,110 @@
+import os
+import re
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+from chatcode.intent_router import intent_router
+
+load_dotenv()
+
+# Send only the k best locally ranked projects to the model, 0 sends them all
+PROMPT_TOP_K = int(os.getenv('PROMPT_TOP_K', '0'))
+
+PROJECT_SYSTEM_PROMPT = """You extract the project name a user query refers to.
+1. Correct any grammatical or spelling errors in the query.
+2. Match the intent of the query against the project list given as "name: description" lines.
+3. Return the matching project name exactly as listed, or "None" if nothing matches or the query is unclear.
+Respond only with JSON enclosed in ~~~, for example:
+~~~{"project": "Project XYZ"}~~~"""
+
+PAYLOAD_SYSTEM_PROMPT = """You fill payload values from a user query using a field schema.
+Schema lines are "field:type(choices or format)=assigned # description".
+1. Take values strictly from the user query. Do not infer or assume values.
+2. If a value is missing or does not match the type, choices or format, use the assigned value.
+3. If there is no valid value and no assigned value, use "None".
+Respond only with the payload JSON enclosed in ~~~, for example:
+~~~{"payload": {"employee_id": "None", "monthnumber": "None", "yearnumber": "None"}}~~~"""
+
+COMBINED_SYSTEM_PROMPT = """You pick the project a user query refers to and fill its payload values.
+Each project is a "## name: description" line followed by its schema lines "field:type(choices or format)=assigned # description".
+1. Correct any spelling errors and match the intent of the query to one project name exactly as listed, or "None" if nothing matches.
+2. Fill that project's fields strictly from the query. Do not infer or assume values.
+3. If a value is missing or invalid, use the assigned value, otherwise "None".
+Respond only with JSON enclosed in ~~~, for example:
+~~~{"project": "Project XYZ", "payload": {"employee_id": "None"}}~~~"""
+
+SUMMARY_SYSTEM_PROMPT = """You are an AI assistant responsible for explaining technical SQL operation results in simple and user-friendly terms.
+The user has performed a CRUD operation (Create, Read, Update, Delete) using an API that interacts with a database.
+
+Provide a concise, clear summary of the operation result in **under 40 words**. Include the relevant payload values.
+Avoid technical jargon and ensure the explanation is easily understandable by non-technical users."""
+
+
+def candidate_projects(projectinfo: Dict[str, str], query: str, jsonfile: str, top_k: int = PROMPT_TOP_K) -> Dict[str, str]:
+    if top_k <= 0 or len(projectinfo) <= top_k:
+        return projectinfo
+    ranked = [name for name, score in intent_router.rank(jsonfile, query) if score > 0]
+    if not ranked:
+        # Nothing overlaps locally, let the model see the whole catalogue
+        return projectinfo
+    return {name: projectinfo[name] for name in ranked[:top_k] if name in projectinfo}
+
+
+def render_projects(projectinfo: Dict[str, str]) -> str:
+    return '\n'.join(f"{name}: {description}" for name, description in projectinfo.items())
+
+
+def render_field(field: str, spec: dict) -> str:
+    datatype = spec.get('datatype', 'string')
+    description = spec.get('description', '')
+    line = f"{field}:{datatype}"
+    if datatype == 'choices':
+        line += f"({'|'.join(str(choice) for choice in spec.get('choices', []))})"
+        # Descriptions often repeat the choice list in brackets
+        description = re.sub(r'\s*\[.*?\]', '', description)
+    elif spec.get('format'):
+        line += f"({spec['format']})"
+    assigned = spec.get('assigned', 'None')
+    if assigned not in (None, 'None'):
+        line += f"={assigned}"
+    if description:
+        line += f" # {description.strip()}"
+    return line
+
+
+def render_schema(payload_details: dict) -> str:
+    return '\n'.join(render_field(field, spec) for field, spec in payload_details.items())
+
+
+def project_messages(query: str, projectinfo: Dict[str, str]) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": PROJECT_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Projects:\n{render_projects(projectinfo)}\n\nQuery: {query}"},
+    ]
+
+
+def payload_messages(query: str, payload_details: dict) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": PAYLOAD_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Schema:\n{render_schema(payload_details)}\n\nQuery: {query}"},
+    ]
+
+
+def combined_messages(query: str, projectinfo: Dict[str, str], schemas: Dict[str, dict]) -> List[Dict[str, str]]:
+    sections = []
+    for name, description in projectinfo.items():
+        schema = render_schema(schemas.get(name) or {})
+        sections.append(f"## {name}: {description}\n{schema or '(no fields)'}")
+    catalogue = '\n'.join(sections)
+    return [
+        {"role": "system", "content": COMBINED_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Projects:\n{catalogue}\n\nQuery: {query}"},
+    ]
+
+
+def summary_messages(answer, payload) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+        {"role": "user", "content": f"The API response is: {answer}. The payload is: {payload}. Please summarize the result in a user-friendly way."},
+    ]
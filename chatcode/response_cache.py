@@ -0,0 +1,76 @@
+import json
+import logging
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, Hashable
+
+from dotenv import load_dotenv
+
+from chatcode.config_registry import registry
+from chatcode.shared_state import StateBackend, state_backend
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '600'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '2048'))
+
+
+def normalize_query(query: str) -> str:
+    # "Get my  leave records?" and "get my leave records" share one entry
+    return ' '.join(re.findall(r'[a-z0-9@._-]+', query.lower()))
+
+
+class ResponseCache:
+    # TTL + LRU bounded cache for model answers, stored in the shared state
+    # backend so every worker benefits from every other worker's calls
+    NAMESPACE = 'llm'
+
+    def __init__(self, backend: StateBackend, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl: float = RESPONSE_CACHE_TTL):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.ttl = ttl
+        backend.configure_namespace(self.NAMESPACE, max_entries)
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def _key(self, stage: str, role: str, model: str, query: str, extra: tuple) -> str:
+        config = registry.get(role)
+        # The role file's mtime fingerprints its content, so editing the file
+        # invalidates that role's entries in every worker at once
+        return json.dumps([stage, config.role, config.mtime, model, query, *extra])
+
+    async def get(self, stage: str, role: str, model: str, query: str, *extra: Hashable) -> Any:
+        value = await self.backend.get(self.NAMESPACE, self._key(stage, role, model, query, extra))
+        if value is None:
+            self.misses[stage] += 1
+            return None
+        self.hits[stage] += 1
+        return json.loads(value)
+
+    async def set(self, stage: str, role: str, model: str, query: str, value: Any, *extra: Hashable):
+        if value is None:
+            return
+        await self.backend.set(self.NAMESPACE, self._key(stage, role, model, query, extra), json.dumps(value), self.ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        stages = {}
+        for stage in set(self.hits) | set(self.misses):
+            hits, misses = self.hits[stage], self.misses[stage]
+            stages[stage] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            }
+        return {
+            'backend': type(self.backend).__name__,
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'stages': stages,
+        }
+
+
+response_cache = ResponseCache(state_backend)
@@ -0,0 +1,167 @@
+import re
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+from chatcode.config_registry import registry
+
+DEFAULT_DATE_FORMATS = (
+    '%Y-%m-%d',       # 2024-09-13
+    '%Y/%m/%d',       # 2024/09/13
+    '%Y.%m.%d',       # 2024.09.13
+    '%Y %b %d',       # 2024 Sep 13
+)
+
+ISO_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def _is_none(value) -> bool:
+    return value is None or value == "None"
+
+
+class FieldValidator:
+    # One field of a project's payload spec with everything it needs precompiled.
+    # validate() returns the value to keep, or None when it is invalid.
+    __slots__ = ('name', 'datatype', 'validate', 'pattern', 'choices', 'date_formats')
+
+    def __init__(self, name: str, spec: dict):
+        self.name = name
+        self.datatype = spec.get('datatype')
+        self.pattern = None
+        self.choices = None
+        self.date_formats = None
+
+        if self.datatype == 'regex':
+            self.pattern = re.compile(spec['format'])
+            self.validate = self._regex
+        elif self.datatype == 'date':
+            self.date_formats = tuple(spec.get('formats', [])) or DEFAULT_DATE_FORMATS
+            self.validate = self._date
+        elif self.datatype == 'choices':
+            self.choices = frozenset(spec['choices'])
+            self.validate = self._choices
+        elif self.datatype == 'string':
+            self.validate = self._string
+        elif self.datatype == 'integer':
+            self.validate = self._integer
+        elif self.datatype == 'mobile':
+            self.validate = self._mobile
+        else:
+            self.validate = self._any
+
+    def _regex(self, value):
+        if _is_none(value) or not isinstance(value, str) or not self.pattern.match(value):
+            return None
+        return value
+
+    def _date(self, value):
+        if _is_none(value) or not isinstance(value, str):
+            return None
+        value = value.strip()
+        for fmt in self.date_formats:
+            if fmt == '%Y-%m-%d' and ISO_DATE.fullmatch(value):
+                # Common case without strptime's format parsing overhead
+                try:
+                    date.fromisoformat(value)
+                    return value
+                except ValueError:
+                    continue
+            try:
+                datetime.strptime(value, fmt)
+                return value
+            except ValueError:
+                continue
+        return None
+
+    def _choices(self, value):
+        try:
+            return value if not _is_none(value) and value in self.choices else None
+        except TypeError:
+            return None
+
+    def _string(self, value):
+        return value if not _is_none(value) and isinstance(value, str) else None
+
+    def _integer(self, value):
+        if _is_none(value):
+            return None
+        try:
+            int(value)
+        except (TypeError, ValueError):
+            return None
+        return value
+
+    def _mobile(self, value):
+        if _is_none(value):
+            return None
+        try:
+            if len(str(int(value))) != 10:
+                return None
+        except (TypeError, ValueError):
+            return None
+        return value
+
+    def _any(self, value):
+        return None if _is_none(value) else value
+
+
+class CompiledSchema:
+    def __init__(self, project_details: dict):
+        self.project = project_details['project']
+        self.url = project_details['url']
+        self.method = project_details['method']
+        # Optional "cache ttl" (seconds) lets database_operation reuse GET responses
+        self.cache_ttl = project_details.get('cache ttl')
+        # Optional "cache scope": GETs cached under it, writes that evict it
+        self.cache_scope = project_details.get('cache scope')
+        # Optional "summary template" renders write results without an LLM call
+        self.summary_template = project_details.get('summary template')
+        self.fields: Dict[str, FieldValidator] = {
+            key: FieldValidator(key, spec) for key, spec in project_details['payload'].items()
+        }
+
+    def validate_field(self, key: str, value: Any) -> Optional[Any]:
+        return self.fields[key].validate(value)
+
+    def validate(self, response_config: dict) -> dict:
+        # Same result shape as function.validate(); fields missing from the response are dropped
+        validated_payload = {
+            key: field.validate(response_config.get(key))
+            for key, field in self.fields.items() if key in response_config
+        }
+        result = {
+            'project': self.project,
+            'url': self.url,
+            'method': self.method,
+            'payload': validated_payload
+        }
+        if self.cache_ttl is not None:
+            result['cache_ttl'] = self.cache_ttl
+        if self.cache_scope is not None:
+            result['cache_scope'] = self.cache_scope
+        if self.summary_template is not None:
+            result['summary_template'] = self.summary_template
+        return result
+
+
+# id(project dict) -> (project dict, compiled schema); holding the dict keeps its id stable
+_compiled: Dict[int, tuple] = {}
+_MAX_COMPILED = 512
+
+
+def compile_schema(project_details: dict) -> CompiledSchema:
+    cached = _compiled.get(id(project_details))
+    if cached is not None and cached[0] is project_details:
+        return cached[1]
+    if len(_compiled) >= _MAX_COMPILED:
+        _compiled.clear()
+    compiled = CompiledSchema(project_details)
+    _compiled[id(project_details)] = (project_details, compiled)
+    return compiled
+
+
+def clear_compiled(role: str = None):
+    _compiled.clear()
+
+
+# Reloaded role files bring new project dicts, drop validators built from the old ones
+registry.add_listener(clear_compiled)
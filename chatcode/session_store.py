@@ -0,0 +1,94 @@
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from chatcode.get_cache import token_id
+from chatcode.shared_state import StateBackend, state_backend
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+SESSION_TTL = float(os.getenv('SESSION_TTL', '1800'))
+SESSION_MAX_ENTRIES = int(os.getenv('SESSION_MAX_ENTRIES', '10000'))
+
+
+class SessionStore(ABC):
+    # Backends store one JSON-serializable dict per session id
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def set(self, session_id: str, data: dict):
+        ...
+
+    @abstractmethod
+    async def delete(self, session_id: str):
+        ...
+
+    async def close(self):
+        pass
+
+
+class StateSessionStore(SessionStore):
+    # Sessions live in the shared state backend: an in-process LRU with
+    # STATE_BACKEND=memory, or a SQLite file every worker can resume from
+    NAMESPACE = 'session'
+
+    def __init__(self, backend: StateBackend, ttl: float = SESSION_TTL, max_entries: int = SESSION_MAX_ENTRIES):
+        self.backend = backend
+        self.ttl = ttl
+        backend.configure_namespace(self.NAMESPACE, max_entries)
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        data = await self.backend.get(self.NAMESPACE, session_id)
+        return json.loads(data) if data is not None else None
+
+    async def set(self, session_id: str, data: dict):
+        await self.backend.set(self.NAMESPACE, session_id, json.dumps(data), self.ttl)
+
+    async def delete(self, session_id: str):
+        await self.backend.delete(self.NAMESPACE, session_id)
+
+
+class ChatSession:
+    # Per-frame handle tying a client's session id to the role it is chatting
+    # as and the bearer token it authenticates with
+    def __init__(self, store: SessionStore, session_id: str, jsonfile: str, bearer_token: Optional[str]):
+        self.store = store
+        self.session_id = session_id
+        self.jsonfile = jsonfile
+        self.owner = token_id(bearer_token or '')
+
+    async def pending_dialog(self) -> Optional[dict]:
+        data = await self.store.get(self.session_id)
+        if not data or data.get('jsonfile') != self.jsonfile:
+            return None
+        if data.get('owner') != self.owner:
+            # Someone else's session id: never hand over their partly filled payload
+            logger.warning("Pending dialog requested with a different token, dropping it")
+            await self.store.delete(self.session_id)
+            return None
+        return data
+
+    async def save_dialog(self, project_details: dict, pay: dict, state):
+        # Only a digest of the token is kept, to check the resuming frame's token against
+        await self.store.set(self.session_id, {
+            'jsonfile': self.jsonfile,
+            'owner': self.owner,
+            'project': project_details['project'],
+            'pay': pay,
+            'dialog': state.to_dict(),
+        })
+
+    async def clear_dialog(self):
+        await self.store.delete(self.session_id)
+
+
+session_store = StateSessionStore(state_backend)
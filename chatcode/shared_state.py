@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# 'memory' is per process; 'sqlite' is shared by every worker on the box
+STATE_BACKEND = os.getenv('STATE_BACKEND', 'memory')
+STATE_SQLITE_PATH = os.getenv('STATE_SQLITE_PATH', 'chat_state.sqlite3')
+STATE_DEFAULT_MAX_ENTRIES = int(os.getenv('STATE_DEFAULT_MAX_ENTRIES', '10000'))
+
+
+class StateBackend(ABC):
+    # Namespaced string key/value store with TTLs, LRU-bounded per namespace,
+    # plus an atomic counter for cross-worker rate limiting.
+
+    def __init__(self):
+        self._max_entries: Dict[str, int] = {}
+
+    def configure_namespace(self, namespace: str, max_entries: int):
+        self._max_entries[namespace] = max_entries
+
+    def max_entries(self, namespace: str) -> int:
+        return self._max_entries.get(namespace, STATE_DEFAULT_MAX_ENTRIES)
+
+    @abstractmethod
+    async def get(self, namespace: str, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def set(self, namespace: str, key: str, value: str, ttl: float):
+        ...
+
+    @abstractmethod
+    async def delete(self, namespace: str, key: str):
+        ...
+
+    @abstractmethod
+    async def incr(self, namespace: str, key: str, amount: int, ttl: float) -> int:
+        ...
+
+    async def close(self):
+        pass
+
+
+class MemoryStateBackend(StateBackend):
+    # Expired entries are otherwise only dropped when read again
+    SWEEP_EVERY = 100
+
+    def __init__(self):
+        super().__init__()
+        # namespace -> key -> (expires_at, value), least recently used first
+        self._namespaces: Dict[str, "OrderedDict[str, tuple]"] = {}
+        self._writes = 0
+
+    def _entries(self, namespace: str) -> "OrderedDict[str, tuple]":
+        return self._namespaces.setdefault(namespace, OrderedDict())
+
+    async def get(self, namespace: str, key: str) -> Optional[str]:
+        entries = self._entries(namespace)
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del entries[key]
+            return None
+        entries.move_to_end(key)
+        return value
+
+    async def set(self, namespace: str, key: str, value: str, ttl: float):
+        entries = self._entries(namespace)
+        entries[key] = (time.monotonic() + ttl, value)
+        self._written(namespace, entries, key)
+
+    def _written(self, namespace: str, entries: "OrderedDict[str, tuple]", key: str):
+        entries.move_to_end(key)
+        self._writes += 1
+        if self._writes % self.SWEEP_EVERY == 0:
+            now = time.monotonic()
+            for expired in [name for name, (expires_at, _) in entries.items() if expires_at <= now]:
+                del entries[expired]
+        limit = self.max_entries(namespace)
+        while len(entries) > limit:
+            entries.popitem(last=False)
+
+    async def delete(self, namespace: str, key: str):
+        self._entries(namespace).pop(key, None)
+
+    async def incr(self, namespace: str, key: str, amount: int, ttl: float) -> int:
+        # Runs without awaiting, so it is atomic within the event loop
+        current = await self.get(namespace, key)
+        entries = self._entries(namespace)
+        if current is None:
+            value = amount
+            entries[key] = (time.monotonic() + ttl, str(value))
+        else:
+            value = int(current) + amount
+            entries[key] = (entries[key][0], str(value))
+        # Per-minute rate windows add a key every minute, bound them like set()
+        self._written(namespace, entries, key)
+        return value
+
+
+class SQLiteStateBackend(StateBackend):
+    # One connection per worker process; WAL lets workers read while one writes
+    EVICT_EVERY = 100
+
+    def __init__(self, path: str = STATE_SQLITE_PATH):
+        super().__init__()
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL, PRIMARY KEY (namespace, key))")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS state_lru ON state (namespace, accessed_at)")
+        self._lock = asyncio.Lock()
+        self._writes = 0
+
+    async def _call(self, func, *args):
+        async with self._lock:
+            return await asyncio.to_thread(func, *args)
+
+    def _get(self, namespace: str, key: str) -> Optional[str]:
+        now = time.time()
+        row = self._conn.execute(
+            "SELECT value FROM state WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (namespace, key, now)).fetchone()
+        if row is None:
+            return None
+        self._conn.execute(
+            "UPDATE state SET accessed_at = ? WHERE namespace = ? AND key = ?", (now, namespace, key))
+        return row[0]
+
+    def _set(self, namespace: str, key: str, value: str, ttl: float):
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO state (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, value, now + ttl, now))
+        self._written(namespace, now)
+
+    def _written(self, namespace: str, now: float):
+        self._writes += 1
+        if self._writes % self.EVICT_EVERY == 0:
+            self._evict(namespace, now)
+
+    def _evict(self, namespace: str, now: float):
+        self._conn.execute("DELETE FROM state WHERE namespace = ? AND expires_at <= ?", (namespace, now))
+        count = self._conn.execute("SELECT COUNT(*) FROM state WHERE namespace = ?", (namespace,)).fetchone()[0]
+        overflow = count - self.max_entries(namespace)
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM state WHERE rowid IN (SELECT rowid FROM state WHERE namespace = ? "
+                "ORDER BY accessed_at LIMIT ?)", (namespace, overflow))
+
+    def _delete(self, namespace: str, key: str):
+        self._conn.execute("DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def _incr(self, namespace: str, key: str, amount: int, ttl: float) -> int:
+        now = time.time()
+        # IMMEDIATE takes the write lock up front so concurrent workers serialize here
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM state WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()
+            if row is None or row[1] <= now:
+                value, expires_at = amount, now + ttl
+            else:
+                value, expires_at = int(row[0]) + amount, row[1]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO state (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, str(value), expires_at, now))
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._written(namespace, now)
+        return value
+
+    async def get(self, namespace: str, key: str) -> Optional[str]:
+        return await self._call(self._get, namespace, key)
+
+    async def set(self, namespace: str, key: str, value: str, ttl: float):
+        await self._call(self._set, namespace, key, value, ttl)
+
+    async def delete(self, namespace: str, key: str):
+        await self._call(self._delete, namespace, key)
+
+    async def incr(self, namespace: str, key: str, amount: int, ttl: float) -> int:
+        return await self._call(self._incr, namespace, key, amount, ttl)
+
+    async def close(self):
+        self._conn.close()
+
+
+def create_state_backend(backend: str = STATE_BACKEND) -> StateBackend:
+    if backend == 'sqlite':
+        logger.info(f"Using shared SQLite state at {STATE_SQLITE_PATH}")
+        return SQLiteStateBackend()
+    if backend != 'memory':
+        logger.warning(f"Unknown STATE_BACKEND '{backend}', using in-memory state")
+    return MemoryStateBackend()
+
+
+def is_shared(backend: StateBackend) -> bool:
+    return not isinstance(backend, MemoryStateBackend)
+
+
+state_backend = create_state_backend()
@@ -0,0 +1,43 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from chatcode.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+coalesced_calls = Counter('single_flight_coalesced_total', 'Calls that joined an identical in-flight call.')
+leader_calls = Counter('single_flight_calls_total', 'Upstream calls made through single-flight groups.')
+
+
+class SingleFlight:
+    # Concurrent callers with the same key share one upstream call. The call
+    # runs as its own task, so a caller that disconnects does not cancel it
+    # for the others; results and exceptions fan out to every waiter.
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._in_flight.get(key)
+        if task is None:
+            leader_calls.inc(group=self.name)
+            task = asyncio.create_task(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done, key=key: self._finished(key, done))
+        else:
+            coalesced_calls.inc(group=self.name)
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        self._in_flight.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as seen even if every waiter has gone away
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+
+backend_flight = SingleFlight('backend_get')
+llm_flight = SingleFlight('llm')
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import logging
+import os
+from functools import lru_cache
+from string import Formatter
+from typing import Any, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import WebSocket
+
+from chatcode.frames import send_frame
+from chatcode.llm_limiter import LLMBusy
+from chatcode.llm_router import routed_completion
+from chatcode.log_config import LOG_REDACT_KEYS
+from chatcode.metrics import Counter, span
+from chatcode.prompt_builder import summary_messages
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# How write results are summarised:
+#   'llm'      - wait for nlp_response, as before
+#   'confirm'  - send a templated confirmation at once, then the LLM summary as a "refine" frame
+#   'template' - templated confirmation only, no LLM call (for high-load periods)
+SUMMARY_MODES = ('llm', 'confirm', 'template')
+SUMMARY_MODE = os.getenv('SUMMARY_MODE', 'llm')
+if SUMMARY_MODE not in SUMMARY_MODES:
+    logger.warning(f"Unknown SUMMARY_MODE '{SUMMARY_MODE}', using 'llm'")
+    SUMMARY_MODE = 'llm'
+
+template_summaries = Counter('summary_template_renders_total', 'Write results summarised from a project template.')
+
+CLOSING = "Glad to help! If you need more assistance, I'm just a message away."
+
+
+def effective_mode(requested: str) -> str:
+    # Operators can force template-only under load whatever the client asked for
+    return 'template' if SUMMARY_MODE == 'template' else requested
+
+
+def is_secret(field: str) -> bool:
+    field = field.lower()
+    return field in LOG_REDACT_KEYS or 'password' in field
+
+
+def describe_value(field: str, value: Any) -> str:
+    return f"{field.replace('_', ' ')}: {value}"
+
+
+def write_failed(result: Any) -> bool:
+    # database_operation returns the raw response text for 4xx/5xx, parsed JSON otherwise
+    return isinstance(result, str)
+
+
+def backend_message(result: Any) -> Optional[str]:
+    if isinstance(result, str):
+        try:
+            result = json.loads(result)
+        except ValueError:
+            return result
+    if isinstance(result, dict) and isinstance(result.get('detail'), str):
+        return result['detail']
+    return None
+
+
+@lru_cache(maxsize=256)
+def template_fields(template: str) -> Tuple[str, ...]:
+    return tuple(field for _, field, _, _ in Formatter().parse(template) if field)
+
+
+def render_summary(template: Optional[str], payload: dict, result: Any) -> Optional[str]:
+    # Fills a project's "summary template" from the payload and the backend's
+    # response fields. None (caller asks the LLM instead) when there is no
+    # template, the write failed, or a placeholder has no usable value.
+    if not template or write_failed(result):
+        return None
+    values = dict(result) if isinstance(result, dict) else {}
+    values.update(payload or {})
+    for field in template_fields(template):
+        if is_secret(field) or values.get(field) in (None, "None", ""):
+            return None
+    try:
+        summary = template.format_map(values)
+    except (KeyError, IndexError, ValueError):
+        logger.warning(f"Bad summary template: {template}")
+        return None
+    template_summaries.inc()
+    return summary
+
+
+def confirmation_text(project: str, payload: dict, result: Any) -> str:
+    # Deterministic one-liner from the project name, the backend message and the
+    # payload values; secrets are never echoed back
+    title = f"{project[:1].upper()}{project[1:]}"
+    message = backend_message(result)
+    if write_failed(result):
+        return f"{title} failed: {(message or 'the server rejected the request').rstrip('.')}."
+    parts = [f"{title} completed"]
+    if message:
+        parts[0] += f": {message.rstrip('.')}"
+    values = [describe_value(field, value) for field, value in (payload or {}).items()
+              if value not in (None, "None", "") and not is_secret(field)]
+    if values:
+        parts.append(f"Details - {', '.join(values)}")
+    return '. '.join(parts) + '.'
+
+
+async def _refine(websocket: WebSocket, result, payload, apikey, model):
+    # Same prompt as nlp_response, but failures stay quiet: the user already has an answer
+    try:
+        with span('nlp_response'):
+            response = await routed_completion(apikey, model, messages=summary_messages(result, payload),
+                                               stage='nlp_response')
+        text = response.choices[0].message.content.strip()
+        if text:
+            await send_frame(websocket, 'refine', text=f"{text}. {CLOSING}")
+    except LLMBusy:
+        # The confirmation already went out, the refinement is optional
+        logger.info("Summary refinement skipped, LLM is busy")
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.warning(f"Summary refinement failed: {e}")
+
+
+def start_refinement(websocket: WebSocket, result, payload, apikey, model):
+    # Runs after the confirmation; the next turn or a disconnect cancels it
+    cancel_refinement(websocket)
+    websocket.state.refine_task = asyncio.create_task(_refine(websocket, result, payload, apikey, model))
+
+
+def cancel_refinement(websocket: WebSocket):
+    task = getattr(websocket.state, 'refine_task', None)
+    if task is not None and not task.done():
+        task.cancel()
+    websocket.state.refine_task = None
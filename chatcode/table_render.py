@@ -0,0 +1,229 @@
+import os
+from typing import Iterable, Iterator, List
+from uuid import uuid4
+
+from dotenv import load_dotenv
+from fastapi import WebSocket
+
+from chatcode.frames import send_frame
+
+load_dotenv()
+
+# 0 sends every row at once; otherwise rows beyond the cap wait for "load more"
+TABLE_ROW_CAP = int(os.getenv('TABLE_ROW_CAP', '0'))
+# Upper bound on the HTML carried by one rows frame for chunked clients
+TABLE_CHUNK_BYTES = int(os.getenv('TABLE_CHUNK_BYTES', '32768'))
+
+NO_DATA_HTML = "<p>No data available</p>"
+
+# Document head with the table styles, emitted once per table
+TABLE_HEAD = '''
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+           body {
+            font-family: Arial, sans-serif;
+            background-color: #f7f7f8;
+            margin: 0;
+            padding: 0;
+            color: #333;
+        }
+        .table-wrapper {
+            width: 100%; /* Make the wrapper take full width of its parent */
+            max-width:990px; /* Limit the maximum width */
+            overflow-x: auto; /* Allow horizontal scrolling if needed */
+            margin: 20px auto; /* Center the wrapper and add margin */
+           b padding: 0 15px; /* Add some padding for smaller screens */
+            ox-sizing: border-box; /* Include padding in the width calculation */
+        }
+        table {
+            width: 100%; /* Ensure table takes the full width of the wrapper */
+            border-collapse: collapse;
+            box-shadow: 0 4px 8px rgba(0, 0, 0, 0.1);
+            margin: 0 auto; /* Center the table within the wrapper */
+            border: 2px solid black;  /* Black border around the table */
+            border-radius: 8px;
+        }
+        th, td {
+            padding: 12px 15px;
+            text-align: left;
+            border: 1px solid black;  /* Black border around cells */
+            white-space: nowrap; /* Prevent text from wrapping */
+        }
+        th {
+            background-color: #3C3D37;
+            color: #fff;
+            text-transform: uppercase;
+            border-bottom: 3px solid #000;  /* Thick bottom border for header */
+        }
+        tr:nth-child(even) {
+            background-color: #f9f9f9;
+        }
+        td {
+            transition: background-color 0.3s ease;
+        }
+
+        /* Responsive design adjustments */
+        @media (max-width: 768px) {
+            .table-wrapper {
+                padding: 0 10px; /* Adjust padding for smaller screens */
+            }
+            table {
+                font-size: 14px; /* Reduce font size for smaller screens */
+            }
+        }
+        @media (max-width: 1024px) {
+            .table-wrapper {
+                padding: 0 10px; /* Adjust padding for smaller screens */
+            }
+            table {
+                font-size: 14px; /* Reduce font size for smaller screens */
+            }
+        }
+        </style>
+    </head>
+    <body>
+        <div class="table-wrapper">
+            <table>
+                <thead>
+                    <tr>'''
+
+TABLE_HEAD_CLOSE = '''
+                    </tr>
+                </thead>
+                <tbody>'''
+
+TABLE_TAIL = '''
+                </tbody>
+            </table>
+        </div>
+    </body>
+    </html>
+    '''
+
+
+def table_rows(data) -> List[dict]:
+    # Ensure data is a list of dictionaries
+    if not data:
+        return []
+    if isinstance(data, dict):
+        return [data]
+    return list(data)
+
+
+def table_headers(rows: Iterable[dict]) -> List[str]:
+    # Unique headers in first-seen order
+    headers = {}
+    for entry in rows:
+        headers.update(dict.fromkeys(entry.keys()))
+    return list(headers)
+
+
+def render_head(headers: List[str]) -> str:
+    return ''.join([TABLE_HEAD, *(f'<th>{header}</th>' for header in headers), TABLE_HEAD_CLOSE])
+
+
+def iter_rows(rows: Iterable[dict], headers: List[str]) -> Iterator[str]:
+    for row in rows:
+        yield '<tr>' + ''.join(f'<td>{row.get(header, "N/A")}</td>' for header in headers) + '</tr>'
+
+
+def iter_chunks(rows: Iterable[dict], headers: List[str], max_bytes: int = TABLE_CHUNK_BYTES) -> Iterator[str]:
+    buffer, size = [], 0
+    for html_row in iter_rows(rows, headers):
+        if buffer and size + len(html_row) > max_bytes:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+        buffer.append(html_row)
+        size += len(html_row)
+    if buffer:
+        yield ''.join(buffer)
+
+
+def columnar_rows(rows: Iterable[dict], headers: List[str]) -> List[list]:
+    return [[row.get(header) for header in headers] for row in rows]
+
+
+def render_table(data) -> str:
+    rows = table_rows(data)
+    if not rows:
+        return NO_DATA_HTML
+    headers = table_headers(rows)
+    return ''.join([render_head(headers), *iter_rows(rows, headers), TABLE_TAIL])
+
+
+class TablePager:
+    def __init__(self, rows: List[dict], page_size: int = TABLE_ROW_CAP):
+        self.id = uuid4().hex
+        self.rows = rows
+        self.headers = table_headers(rows)
+        self.page_size = page_size
+        self.offset = 0
+
+    @property
+    def total(self) -> int:
+        return len(self.rows)
+
+    @property
+    def more(self) -> bool:
+        return self.offset < self.total
+
+    def next_page(self) -> List[dict]:
+        end = self.total if self.page_size <= 0 else self.offset + self.page_size
+        page = self.rows[self.offset:end]
+        self.offset += len(page)
+        return page
+
+
+async def send_table(websocket: WebSocket, data):
+    rows = table_rows(data)
+    options = getattr(websocket.state, 'client_options', None)
+    if not rows:
+        websocket.state.table_pager = None
+        if options is not None and options.result_format == 'columnar':
+            await send_frame(websocket, 'result', id=uuid4().hex, columns=[], rows=[],
+                             shown=0, total=0, more=False)
+        else:
+            await websocket.send_text(NO_DATA_HTML)
+        return
+
+    page_size = options.table_page_size if options is not None else TABLE_ROW_CAP
+    pager = TablePager(rows, page_size)
+    await send_table_page(websocket, pager, first=True)
+
+
+async def send_table_page(websocket: WebSocket, pager: TablePager, first: bool = False):
+    options = getattr(websocket.state, 'client_options', None)
+    page = pager.next_page()
+    # Keep the pager only while there is something left for "load more"
+    websocket.state.table_pager = pager if pager.more else None
+
+    if options is not None and options.result_format == 'columnar':
+        # Header list once plus row arrays; the client renders the table itself
+        await send_frame(websocket, 'result', id=pager.id, columns=pager.headers,
+                         rows=columnar_rows(page, pager.headers),
+                         shown=pager.offset, total=pager.total, more=pager.more)
+        return
+
+    if options is not None and options.chunked_tables:
+        if first:
+            await send_frame(websocket, 'table', event='start', id=pager.id,
+                             head=render_head(pager.headers), total=pager.total)
+        for chunk in iter_chunks(page, pager.headers):
+            await send_frame(websocket, 'table', event='rows', id=pager.id, html=chunk)
+        await send_frame(websocket, 'table', event='end', id=pager.id, tail=TABLE_TAIL,
+                         shown=pager.offset, total=pager.total, more=pager.more)
+        return
+
+    await websocket.send_text(''.join([render_head(pager.headers), *iter_rows(page, pager.headers), TABLE_TAIL]))
+    if pager.more:
+        await websocket.send_text(f"Showing {pager.offset} of {pager.total} rows. Type 'load more' to see the rest.")
+
+
+async def send_next_table_page(websocket: WebSocket) -> bool:
+    pager = getattr(websocket.state, 'table_pager', None)
+    if pager is None:
+        return False
+    await send_table_page(websocket, pager)
+    return True
@@ -0,0 +1,36 @@
+import asyncio
+import logging
+import os
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+
+from chatcode.http_pool import backend_pool
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+BACKEND_WARMUP = os.getenv('BACKEND_WARMUP', 'true').lower() == 'true'
+
+# Keeps fire-and-forget warm-up tasks referenced until they finish
+_background = set()
+
+
+def dialog_pending(details: dict) -> bool:
+    return any(value in (None, "None") for value in (details.get('payload') or {}).values())
+
+
+def warm_backend(details: dict):
+    # Called once validate() has run. While payload fields are still missing,
+    # ask_user (or update_process, which asks which fields to change when none
+    # were given) waits on the user first, so the connection can open
+    # meanwhile. A request with everything filled goes out at once, whatever
+    # its method, and a warm-up beside it would only race it.
+    if not BACKEND_WARMUP or not dialog_pending(details):
+        return
+    # Only the origin matters, and the URL may still hold unfilled placeholders
+    parts = urlsplit(details['url'])
+    task = asyncio.create_task(backend_pool.warm(backend_pool.rebase(f"{parts.scheme}://{parts.netloc}/")))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
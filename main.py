@@ -1,22 +1,65 @@
 import asyncio
 import json
 import logging
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+
 import httpx  # Import httpx for making HTTP requests
 from fastapi import (Depends, FastAPI, HTTPException, WebSocket,
                     WebSocketDisconnect, status)
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
 # Other imports...
 from chatcode.api_call import *
+from chatcode.client_options import negotiate_options
+from chatcode.frames import send_busy
 from chatcode.function import *
+from chatcode.config_registry import registry
+from chatcode.dialog_state import DialogState
 from chatcode.groq_function import *
+from chatcode.http_pool import backend_pool
+from chatcode.intent_router import intent_router
+from chatcode.llm_client import close_llm_clients
+from chatcode.llm_limiter import LLMBusy, llm_limiter
+from chatcode.log_config import setup_logging
+from chatcode.loop_monitor import loop_monitor
+from chatcode.metrics import (CallbackMetric, chat_turns, new_trace,
+                              render_metrics, span)
 from chatcode.onbapi_call import *
+from chatcode.response_cache import response_cache
+from chatcode.session_store import ChatSession, session_store
+from chatcode.shared_state import is_shared, state_backend
+from chatcode.summary import (CLOSING, cancel_refinement, confirmation_text,
+                              effective_mode, render_summary, start_refinement)
+from chatcode.table_render import send_next_table_page
+from chatcode.warmup import warm_backend
 from chatcode.onbfunction import (collect_user_input, get_jsonfile,
                                 validate_input)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if int(os.getenv('WEB_CONCURRENCY', '1')) > 1 and not is_shared(state_backend):
+        logger.warning("Running several workers with STATE_BACKEND=memory: sessions and caches are not shared")
+    # Role/onboarding configs are parsed once here and hot-reloaded on change
+    registry.start()
+    # One keep-alive client for every backend call instead of one per request
+    backend_pool.start()
+    # Lag metric plus a stack sample whenever something blocks the loop
+    loop_monitor.start()
+    yield
+    await loop_monitor.stop()
+    await registry.stop()
+    await backend_pool.close()
+    await state_backend.close()
+    # Release the pooled LLM connections shared by all chat sockets
+    await close_llm_clients()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS middleware setup
 app.add_middleware(
@@ -35,15 +78,46 @@ FRONTEND_URL = "http://127.0.0.1:5000"  # Replace with your actual URL
 
 @app.get("/")
 async def get():
-    async with httpx.AsyncClient() as client:
-        response = await client.get(FRONTEND_URL)
-        if response.status_code != 200:
-            return HTMLResponse("File not found", status_code=404)
-        return HTMLResponse(response.text)
+    response = await backend_pool.request("GET", FRONTEND_URL)
+    if response.status_code != 200:
+        return HTMLResponse("File not found", status_code=404)
+    return HTMLResponse(response.text)
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "intent_router": intent_router.stats(),
+        "response_cache": response_cache.stats(),
+        "llm_limiter": llm_limiter.stats(),
+    }
+
+
+def _router_samples(outcome):
+    counts = intent_router.hits if outcome == 'hit' else intent_router.misses
+    return [({'role': role}, value) for role, value in counts.items()]
+
+
+def _cache_samples(outcome):
+    counts = response_cache.hits if outcome == 'hit' else response_cache.misses
+    return [({'stage': stage}, value) for stage, value in counts.items()]
+
+
+CallbackMetric('intent_router_hits_total', 'Queries routed to a project without the model.', 'counter',
+               lambda: _router_samples('hit'))
+CallbackMetric('intent_router_misses_total', 'Queries the router left to the model.', 'counter',
+               lambda: _router_samples('miss'))
+CallbackMetric('llm_cache_hits_total', 'LLM response cache hits.', 'counter', lambda: _cache_samples('hit'))
+CallbackMetric('llm_cache_misses_total', 'LLM response cache misses.', 'counter', lambda: _cache_samples('miss'))
+
 
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+
+# Configure logging: JSON lines written from a background thread, see chatcode/log_config.py
+setup_logging()
 logger = logging.getLogger(__name__)
 
 @app.websocket("/ws/onboard")
@@ -55,7 +129,7 @@ async def websocket_endpoint(websocket: WebSocket):
             data = await websocket.receive_text()
             data_json = json.loads(data)
             user_message = data_json.get("message", "").strip().lower()            
-            print(f"Received message: '{user_message}'")  # Debugging: Log the received message
+            logger.debug("Received message: '%s'", user_message)
 
             if user_message == 'quit':
                 await websocket.send_text("Please wait,You will be Navigated to Login Screen")  # Redirect to the new page
@@ -68,11 +142,9 @@ async def websocket_endpoint(websocket: WebSocket):
                 details = await collect_user_input(websocket, file, validate_input)
                 details['dateofbirth'] = datetime.strptime(details['dateofbirth'], '%Y-%m-%d').strftime('%Y-%m-%d')
                 details['contactnumber'] = int(details['contactnumber'])
-                print('*****************************')
-                print(details)
-                print('*****************************')
+                logger.debug("Onboarding details: %s", details)
                 response = await onboard_personal_details(websocket,details)
-                print(response)
+                logger.debug("Onboarding response: %s", response)
                 if response != "Email Send Successfully":
                     await websocket.send_text(response)
                     await websocket.send_text("You will be Navigated to Login Screen")  # Redirect to the new page
@@ -95,62 +167,176 @@ async def websocket_endpoint(websocket: WebSocket):
         await websocket.send_text(json.dumps({"Response": "An error occurred. Please try again."}))
 
 
+async def deliver_result(websocket: WebSocket, answer: dict, apikey, model, options):
+    # Database operation
+    with span('database_operation'):
+        result,payload = await database_operation(websocket, answer)
+    
+    logger.debug("Database operation result: %s payload: %s", result, payload)
+    
+    if result == "Table" and payload == "Return":
+        await websocket.send_text("Glad to help! If you need more assistance, I'm just a message away.")
+        return
+    
+    elif result and payload:
+        if result == 'Internal Server Error':
+            await websocket.send_text(f"{result}. Sorry for inconvenience, try after sometime.")
+            return
+        else:
+            # Projects with a "summary template" are summarised locally in every mode
+            summary = render_summary(answer.get('summary_template'), payload, result)
+            if summary is not None:
+                await websocket.send_text(f"{summary} {CLOSING}")
+                return
+            mode = effective_mode(options.summary_mode)
+            if mode != 'llm':
+                # Generic confirmation now; 'confirm' follows up with the LLM summary
+                await websocket.send_text(f"{confirmation_text(answer.get('project', ''), payload, result)} {CLOSING}")
+                if mode == 'confirm':
+                    start_refinement(websocket, result, payload, apikey, model)
+                return
+            try:
+                if options.stream:
+                    # Summary tokens go out as start/delta/end frames as they arrive
+                    with span('nlp_response'):
+                        await stream_nlp_response(websocket, result, payload, apikey, model,
+                                                  ". Glad to help! If you need more assistance, I'm just a message away.")
+                    return
+                with span('nlp_response'):
+                    model_output = await nlp_response(websocket, result, payload, apikey, model)
+            except LLMBusy:
+                # The write already happened; report the backend's own message instead of a summary
+                model_output = result.get('detail', result) if isinstance(result, dict) else result
+            await websocket.send_text(f"{model_output}. Glad to help! If you need more assistance, I'm just a message away.")
+            return
+
+    
+    elif result and  not payload:
+        
+        if isinstance(result, str):
+            result = json.loads(result)
+            result =  result['detail']
+            await websocket.send_text(f"{result}. Glad to help! If you need more assistance, I'm just a message away.")
+            return
+        if 'detail' in result:
+            result =  result['detail']
+            await websocket.send_text(f"{result}. Glad to help! If you need more assistance, I'm just a message away.")
+            return
+        else:
+            await websocket.send_text(f"check not payload")
+            return
+    
+    else:
+        await websocket.send_text("Back end server error try again.")
+        await asyncio.sleep(3)
+        return
+
+
 @app.websocket("/ws/chat")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
+    first_frame = True
     try:
         while True:
             try:
                 # Receiving data
                 data = await websocket.receive_text()
+                # A summary still being refined is stale once the user moves on
+                cancel_refinement(websocket)
                 data_json = json.loads(data)
-                print('________________________________________________________________________________________')
-                print("data json :", data_json)
-                print('________________________________________________________________________________________')
+                new_trace()
+                chat_turns.inc()
+                logger.debug("data json: %s", data_json)
 
                 token = data_json.get("token")
                 user_message = data_json.get("message")
                 role = data_json.get("role")
                 apikey = data_json.get('apikey')
                 model = data_json.get('model')
+                options = negotiate_options(websocket, data_json)
+                jsonfile = choose_json(role)
+                session_id = data_json.get('session_id')
+                session = ChatSession(session_store, session_id, jsonfile, token) if session_id else None
+                resume, first_frame = first_frame, False
+
+                # Next page of the last table, no model or backend call needed
+                if user_message.strip().lower() == 'load more':
+                    if not await send_next_table_page(websocket):
+                        await websocket.send_text("There are no more rows to load.")
+                    continue
 
                 # Check for 'quit' message
                 if user_message.lower() == 'quit':
+                    if session is not None:
+                        await session.clear_dialog()
                     await websocket.send_text("Goodbye, Thanks for using our app!")
                     await asyncio.sleep(3)
                     await websocket.send_text("quit")
                     break
                 
+                # A reconnecting client picks up slot filling where it dropped,
+                # without classifying or extracting the payload again. Its
+                # message either answers the pending slot or is a new request
+                if resume and session is not None:
+                    pending = await session.pending_dialog()
+                    project_details = get_project_script(pending['project'], jsonfile) if pending else None
+                    if isinstance(project_details, dict):
+                        state = DialogState.from_dict(pending['dialog'])
+                        if (user_message.strip().lower() in RESUME_COMMANDS
+                                or (intent_router.matches(jsonfile, user_message) is None
+                                    and answer_pending(project_details, state, user_message))):
+                            await websocket.send_text(f"Resuming your previous request: {pending['project']}")
+                            with span('dialog'):
+                                answer = await ask_user(websocket, project_details, pending['pay'], session, state)
+                            if answer is None:
+                                continue
+                            answer['bearer_token'] = token
+                            await deliver_result(websocket, answer, apikey, model, options)
+                            continue
+                        await websocket.send_text(f"Your unfinished request '{pending['project']}' was cancelled.")
+                    if pending:
+                        await session.clear_dialog()
+
                 # Main logic
-                jsonfile = choose_json(role)
-                response = await get_project_details(websocket, user_message, jsonfile, apikey, model)
-                query = response[0]
-                project_name = response[1]
-                print('________________________________________________________________________________________')
-                print('Query amd Project name') 
-                print(query)
-                print(project_name)
+                query = user_message
+                project_name = None
+                filled_cleaned = None
+                resolve_locally = True
+                if CHAT_PIPELINE_MODE == 'combined':
+                    # One model call for project and payload unless the project is already known locally
+                    with span('resolve_project_locally'):
+                        project_name = await resolve_project_locally(user_message, jsonfile, model, registry.project_info(jsonfile))
+                    resolve_locally = False
+                    if project_name is None:
+                        with span('get_project_and_payload'):
+                            combined = await get_project_and_payload(websocket, user_message, jsonfile, apikey, model)
+                        if combined is not None:
+                            project_name, filled_cleaned = combined
+
+                if project_name is None:
+                    with span('get_project_details'):
+                        response = await get_project_details(websocket, user_message, jsonfile, apikey, model, resolve_locally)
+                    query = response[0]
+                    project_name = response[1]
+                logger.debug("Query: %s project name: %s", query, project_name)
+                if project_name is None:
+                    # Retry budget for irrelevant queries is spent, wait for a fresh message
+                    continue
                 if isinstance(project_name, str) and project_name == "Groq API error":
                         await websocket.send_text("Error: Failed to process the response from Groq API.")
                         await asyncio.sleep(3)
                         await websocket.send_text('navigateerror')
                         continue
-                print('________________________________________________________________________________________')
                 project_details = get_project_script(project_name, jsonfile)
-                print('________________________________________________________________________________________')
-                print('Project Details') 
-                print(project_details)
-                print('________________________________________________________________________________________')
+                logger.debug("Project details: %s", project_details)
                 payload_details = split_payload_fields(project_details)
-                print('________________________________________________________________________________________')
-                print('Payload Details') 
-                print(payload_details)
-                print('________________________________________________________________________________________')
-                if payload_details != {}:
-                    print('________________________________________________________________________________________')
-                    print('Payload Detail is Not Empty')
-                    print("123",model)
-                    filled_cleaned = await fill_payload_values(websocket, query, payload_details,jsonfile, apikey, model)
+                logger.debug("Payload details: %s", payload_details)
+                if filled_cleaned is not None:
+                    logger.debug("Payload filled by combined extraction")
+                elif payload_details != {}:
+                    logger.debug("Filling payload with model %s", model)
+                    with span('fill_payload_values'):
+                        filled_cleaned = await fill_payload_values(websocket, query, payload_details,jsonfile, apikey, model, project_name)
                     # Check if response indicates a Groq API error
                     if isinstance(filled_cleaned, str) and filled_cleaned == "Groq API error":
                         await websocket.send_text("Error: Failed to process the response from Groq API.")
@@ -158,77 +344,43 @@ async def websocket_endpoint(websocket: WebSocket):
                         await websocket.send_text('navigateerror')
                         continue
                 else:
-                    print('________________________________________________________________________________________')
-                    print('Payload Detail is Empty')
+                    logger.debug("Payload detail is empty")
                     filled_cleaned = payload_details
                         
                 
-                validate_payload = validate(project_details, filled_cleaned) 
-                print('Validate Payload') 
-                print(validate_payload)
-                print('________________________________________________________________________________________')
+                with span('validate'):
+                    validate_payload = validate(project_details, filled_cleaned)
+                logger.debug("Validated payload: %s", validate_payload)
+
+                # Open the backend connection while the dialog collects the rest
+                warm_backend(validate_payload)
                 
                 # Handling PUT requests
                 if validate_payload['method'] == 'PUT':
-                    answer = await update_process(websocket, project_details, validate_payload)
-                    print("---------------------------------------------------------------------------------------------------------------------------")
-                    logger.info(f"Answer from update_process: {answer}")
-                    print("---------------------------------------------------------------------------------------------------------------------------")
+                    with span('dialog'):
+                        answer = await update_process(websocket, project_details, validate_payload, session)
+                    logger.debug("Answer from update_process: %s", answer)
                 else:
                     # Handling other requests
-                    answer = await ask_user(websocket, project_details, validate_payload)
-                    print("---------------------------------------------------------------------------------------------------------------------------")
-                    logger.info(f"Answer from ask_user: {answer}")
-                    print("---------------------------------------------------------------------------------------------------------------------------")
+                    with span('dialog'):
+                        answer = await ask_user(websocket, project_details, validate_payload, session)
+                    logger.debug("Answer from ask_user: %s", answer)
                 
+                if answer is None:
+                    # Slot filling was abandoned after too many invalid answers
+                    continue
                 answer['bearer_token'] = token
 
                     
                 
-                # Database operation
-                result,payload = await database_operation(websocket, answer)
-                
-                print('result :',result)
-                print('payload :',payload)
-                
-                if result == "Table" and payload == "Return":
-                    await websocket.send_text("Glad to help! If you need more assistance, I'm just a message away.")
-                    continue
-                
-                elif result and payload:
-                    if result == 'Internal Server Error':
-                        await websocket.send_text(f"{result}. Sorry for inconvenience, try after sometime.")
-                        continue
-                    else:
-                        model_output = await nlp_response(websocket, result, payload, apikey, model)
-                        await websocket.send_text(f"{model_output}. Glad to help! If you need more assistance, I'm just a message away.")
-                        continue
+                await deliver_result(websocket, answer, apikey, model, options)
 
-                
-                elif result and  not payload:
-                    
-                    if isinstance(result, str):
-                        result = json.loads(result)
-                        result =  result['detail']
-                        await websocket.send_text(f"{result}. Glad to help! If you need more assistance, I'm just a message away.")
-                        continue
-                    if 'detail' in result:
-                        result =  result['detail']
-                        await websocket.send_text(f"{result}. Glad to help! If you need more assistance, I'm just a message away.")
-                        continue
-                    else:
-                        await websocket.send_text(f"check not payload")
-                        continue
-                
-                else:
-                    await websocket.send_text("Back end server error try again.")
-                    await asyncio.sleep(3)
-                    continue
-                
+            except LLMBusy as busy:
+                logger.warning(f"Turn rejected: {busy}")
+                await send_busy(websocket, busy.retry_after)
 
-                                                    
             except Exception as e:
-                print('Chat error')
+                logger.exception("Chat error")
                 await websocket.send_text(f"An error occurred: {str(e)}")
 
 
@@ -236,10 +388,17 @@ async def websocket_endpoint(websocket: WebSocket):
         logger.info("WebSocket disconnected")
         await asyncio.sleep(3)
     except Exception as e:
-        print('out of chat')
         logger.error(f"Unexpected error in WebSocket connection: {str(e)}")
         await asyncio.sleep(3)
     finally:
+        cancel_refinement(websocket)
         await websocket.close()
 
 
+if __name__ == "__main__":
+    import uvicorn
+
+    # Workers are stateless; sessions, the LLM cache and rate limits live in
+    # the shared state backend (set STATE_BACKEND=sqlite for more than one)
+    uvicorn.run("main:app", host=os.getenv('HOST', '0.0.0.0'), port=int(os.getenv('PORT', '8000')),
+                workers=int(os.getenv('WEB_CONCURRENCY', '1')))
@@ -0,0 +1,28 @@
+import pytest
+
+from chatcode.client_options import ClientOptions
+from chatcode.table_render import TABLE_ROW_CAP
+
+
+@pytest.mark.parametrize('value', ['ten', None, [5], {}])
+def test_bad_page_size_falls_back(value):
+    assert ClientOptions.from_frame({'table_page_size': value}).table_page_size == TABLE_ROW_CAP
+
+
+@pytest.mark.parametrize('value, expected', [('25', 25), (25, 25), (-3, 1), (0, 1)])
+def test_page_size_is_at_least_one(value, expected):
+    assert ClientOptions.from_frame({'table_page_size': value}).table_page_size == expected
+
+
+def test_missing_page_size_uses_server_default():
+    assert ClientOptions.from_frame({}).table_page_size == TABLE_ROW_CAP
+
+
+@pytest.mark.parametrize('value, expected', [('false', False), ('true', True), (True, True), (0, False), (None, False)])
+def test_flags(value, expected):
+    options = ClientOptions.from_frame({'stream': value, 'table_chunks': value})
+    assert options.stream is expected and options.chunked_tables is expected
+
+
+def test_unknown_result_format_is_html():
+    assert ClientOptions.from_frame({'result_format': 'xml'}).result_format == 'html'
@@ -0,0 +1,47 @@
+import asyncio
+
+from chatcode.config_registry import registry
+from chatcode.dialog_state import DialogState
+from chatcode.function import answer_pending
+from chatcode.session_store import ChatSession, StateSessionStore
+from chatcode.shared_state import MemoryStateBackend
+
+
+def pending_leave(**filled):
+    values = {'leave_type': 'None', 'duration': 'None', 'start_date': 'None', 'total_days': 'None', 'reason': 'None'}
+    values.update(filled)
+    return registry.project('employee', 'apply new leave'), DialogState(values)
+
+
+def test_valid_answer_fills_the_pending_slot():
+    project, state = pending_leave(leave_type='sick')
+    assert answer_pending(project, state, ' Halfday ')
+    assert state.values['duration'] == 'halfday'
+    assert state.current == 'start_date'
+
+
+def test_invalid_answer_leaves_the_dialog_untouched():
+    project, state = pending_leave(leave_type='sick')
+    assert not answer_pending(project, state, 'show my leave records')
+    assert state.current == 'duration'
+    assert state.values['duration'] == 'None'
+
+
+def test_finished_dialog_takes_no_answer():
+    project, state = pending_leave(leave_type='sick', duration='oneday', start_date='2024-05-02',
+                                   total_days=1, reason='fever')
+    assert not answer_pending(project, state, 'sick')
+
+
+def test_pending_dialog_belongs_to_the_saving_token():
+    store = StateSessionStore(MemoryStateBackend())
+    project, state = pending_leave(leave_type='sick')
+
+    async def scenario():
+        await ChatSession(store, 'session-1', 'employee.json', 'owner-token').save_dialog(
+            project, {'payload': state.values}, state)
+        assert await ChatSession(store, 'session-1', 'employee.json', 'owner-token').pending_dialog() is not None
+        assert await ChatSession(store, 'session-1', 'employee.json', 'other-token').pending_dialog() is None
+        # The record is gone for its owner too once another token asked for it
+        return await ChatSession(store, 'session-1', 'employee.json', 'owner-token').pending_dialog()
+    assert asyncio.run(scenario()) is None
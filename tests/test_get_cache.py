@@ -0,0 +1,64 @@
+import asyncio
+
+from chatcode.config_registry import registry
+from chatcode.function import validate
+from chatcode.get_cache import GetCache, cache_scopes
+from chatcode.shared_state import MemoryStateBackend
+
+ADMIN, EMPLOYEE = 'admin-token', 'employee-token'
+
+
+def details(role, project, **payload):
+    return validate(registry.project(role, project), payload)
+
+
+def cached_after_write(reader, read, writer, write):
+    cache = GetCache(MemoryStateBackend())
+    url = read['url'].format(**read['payload'])
+
+    async def scenario():
+        key = await cache.key(reader, url, {}, cache_scopes(read))
+        await cache.set(key, [{'leave_id': 1}], 30)
+        assert await cache.get(key) is not None
+        await cache.invalidate(writer, cache_scopes(write))
+        return await cache.get(await cache.key(reader, url, {}, cache_scopes(read)))
+    return asyncio.run(scenario())
+
+
+def test_employee_leave_write_evicts_admin_leave_reads():
+    read = details('admin', 'get pending leaves', employee_id=5)
+    write = details('employee', 'apply new leave')
+    assert cached_after_write(ADMIN, read, EMPLOYEE, write) is None
+
+
+def test_admin_leave_write_evicts_employee_leave_reads():
+    read = details('employee', 'get leave details')
+    write = details('admin', 'delete leave record', leave_id=12)
+    assert cached_after_write(EMPLOYEE, read, ADMIN, write) is None
+
+
+def test_unrelated_write_keeps_other_users_reads():
+    read = details('employee', 'get leave details')
+    write = details('admin', 'create role function', role_id=3, function='audit', jsonfile='admin')
+    assert cached_after_write(EMPLOYEE, read, ADMIN, write) is not None
+
+
+def test_write_during_the_backend_get_is_not_undone():
+    read = details('employee', 'get leave details')
+    write = details('employee', 'apply new leave')
+    cache = GetCache(MemoryStateBackend())
+    url = read['url']
+
+    async def scenario():
+        key = await cache.key(EMPLOYEE, url, {}, cache_scopes(read))
+        assert await cache.get(key) is None
+        # The write lands while the GET is still in flight
+        await cache.invalidate(EMPLOYEE, cache_scopes(write))
+        await cache.set(key, [{'status': 'stale'}], 30)
+        return await cache.get(await cache.key(EMPLOYEE, url, {}, cache_scopes(read)))
+    assert asyncio.run(scenario()) is None
+
+
+def test_projects_without_a_scope_use_the_url():
+    assert cache_scopes({'url': 'https://hr.example/admin/roles/3/functions/'}) == ['admin/roles']
+    assert cache_scopes({'url': 'https://hr.example/auth/change-password'}) == ['auth']
@@ -0,0 +1,49 @@
+import pytest
+
+from chatcode.intent_router import IntentRouter
+
+
+@pytest.fixture
+def router():
+    return IntentRouter()
+
+
+@pytest.mark.parametrize('query', ['create role', 'create a role', 'add a role'])
+def test_partial_role_names_go_to_the_llm(router, query):
+    # Fits both "create new role" and "create role function"
+    assert router.route('admin', query) is None
+
+
+@pytest.mark.parametrize('query, project', [
+    ('create new role', 'create new role'),
+    ('add role function', 'create role function'),
+    ('create function for role 3', 'create role function'),
+    ('delete role 4', 'delete role'),
+    ('delete role function 5', 'delete role function'),
+    ('update role function 3', 'update role function'),
+    ('get role function', 'get role function'),
+    ('assign role 2 to employee 7', 'assign role to employee'),
+])
+def test_admin_role_and_function_queries(router, query, project):
+    assert router.route('admin', query) == project
+
+
+@pytest.mark.parametrize('role, query, project', [
+    ('employee.json', 'I want to apply for sick leave', 'apply new leave'),
+    ('employee', 'change my password', 'update password'),
+    ('teamlead', 'show pending leaves', 'get pending leaves'),
+])
+def test_other_roles(router, role, query, project):
+    assert router.route(role, query) == project
+
+
+def test_misses_are_counted(router):
+    router.route('admin', 'create role')
+    router.route('admin', 'create new role')
+    assert router.stats()['admin'] == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+
+def test_matches_leaves_the_stats_alone(router):
+    assert router.matches('admin', 'create new role') == 'create new role'
+    assert router.matches('admin', 'create role') is None
+    assert router.stats() == {}
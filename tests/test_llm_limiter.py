@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from chatcode import llm_limiter
+from chatcode.llm_limiter import KeyLimiter, LLMBusy
+
+
+def test_grant_racing_the_timeout_keeps_the_slot(monkeypatch):
+    limiter = KeyLimiter('key', rate=2, burst=1, max_in_flight=4)
+
+    async def granted_then_timed_out(waiter, timeout):
+        # What happens when the refill timer fires in the same loop pass as the deadline
+        limiter._take()
+        limiter.waiters.remove(waiter)
+        waiter.set_result(None)
+        raise asyncio.TimeoutError
+
+    async def scenario():
+        await limiter.acquire(0.5)
+        monkeypatch.setattr(llm_limiter.asyncio, 'wait_for', granted_then_timed_out)
+        await limiter.acquire(0.5)
+        assert limiter.in_flight == 2
+        limiter.release()
+        limiter.release()
+    asyncio.run(scenario())
+    assert limiter.in_flight == 0
+
+
+def test_coinciding_refill_and_deadline_never_leaks():
+    limiter = KeyLimiter('key', rate=2, burst=1, max_in_flight=8)
+
+    async def call():
+        try:
+            await limiter.acquire(0.5)
+        except LLMBusy:
+            return
+        await asyncio.sleep(0.01)
+        limiter.release()
+
+    async def scenario():
+        await asyncio.gather(*(call() for _ in range(8)))
+        await asyncio.sleep(0.05)
+    asyncio.run(scenario())
+    assert limiter.in_flight == 0
+
+
+def test_timed_out_waiters_leave_the_queue():
+    limiter = KeyLimiter('key', rate=0.1, burst=1, max_in_flight=4)
+
+    async def scenario():
+        await limiter.acquire(0.1)
+        with pytest.raises(LLMBusy):
+            await limiter.acquire(0.05)
+        assert not limiter.waiters
+        limiter.release()
+        if limiter._timer is not None:
+            limiter._timer.cancel()
+    asyncio.run(scenario())
@@ -0,0 +1,19 @@
+import time
+
+from chatcode.metrics import render_metrics, span, user_wait
+
+
+def stage_sum(stage):
+    for line in render_metrics().splitlines():
+        if line.startswith('chat_stage_seconds_sum') and f'stage="{stage}"' in line:
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+
+def test_user_wait_is_kept_out_of_enclosing_spans():
+    dialog, waited = stage_sum('test_dialog'), stage_sum('user_wait')
+    with span('test_dialog'):
+        with user_wait():
+            time.sleep(0.2)
+    assert stage_sum('test_dialog') - dialog < 0.05
+    assert stage_sum('user_wait') - waited >= 0.2
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from chatcode.shared_state import MemoryStateBackend, SQLiteStateBackend
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    backend = MemoryStateBackend() if request.param == 'memory' else SQLiteStateBackend(str(tmp_path / 'state.sqlite3'))
+    yield backend
+    asyncio.run(backend.close())
+
+
+def count_keys(backend, namespace):
+    if isinstance(backend, MemoryStateBackend):
+        return len(backend._entries(namespace))
+    return backend._conn.execute("SELECT COUNT(*) FROM state WHERE namespace = ?", (namespace,)).fetchone()[0]
+
+
+def backend_slack(backend):
+    # SQLite trims every EVICT_EVERY writes rather than on each one
+    return 0 if isinstance(backend, MemoryStateBackend) else SQLiteStateBackend.EVICT_EVERY
+
+
+def test_incr_counts_within_ttl(backend):
+    async def scenario():
+        assert await backend.incr('rate', 'key', 1, 60) == 1
+        assert await backend.incr('rate', 'key', 2, 60) == 3
+    asyncio.run(scenario())
+
+
+def test_incr_respects_namespace_limit(backend):
+    backend.configure_namespace('rate', 10)
+
+    async def scenario():
+        for window in range(500):
+            await backend.incr('rate', f"key:{window}", 1, 120)
+    asyncio.run(scenario())
+    assert count_keys(backend, 'rate') <= 10 + backend_slack(backend)
+
+
+def test_incr_sweeps_expired_counters(backend):
+    async def scenario():
+        for window in range(300):
+            await backend.incr('rate', f"key:{window}", 1, 0)
+    asyncio.run(scenario())
+    assert count_keys(backend, 'rate') < 100
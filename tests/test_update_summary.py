@@ -0,0 +1,39 @@
+import asyncio
+import json
+
+from chatcode.config_registry import registry
+from chatcode.function import update_process, validate
+from chatcode.summary import render_summary
+
+
+class FakeSocket:
+    def __init__(self, *replies):
+        self.replies = [json.dumps({'message': reply}) for reply in replies]
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+    async def receive_text(self):
+        return self.replies.pop(0)
+
+
+def update_leave_status(socket, **payload):
+    project = registry.project('teamlead', 'update leave status')
+    details = validate(project, payload)
+    return asyncio.run(update_process(socket, project, details))
+
+
+def test_filled_put_keeps_its_summary_template():
+    answer = update_leave_status(FakeSocket(), leave_id=12, status='approved', reason=None)
+    assert answer['cache_scope'] == 'leave'
+    assert render_summary(answer.get('summary_template'), answer['payload'], {'detail': 'Updated'}) \
+        == "Leave 12 has been marked approved."
+
+
+def test_put_through_the_dialog_keeps_its_summary_template():
+    socket = FakeSocket('status', '12', 'approved')
+    answer = update_leave_status(socket, leave_id=None, status=None, reason=None)
+    assert not socket.replies
+    assert render_summary(answer.get('summary_template'), answer['payload'], {'detail': 'Updated'}) \
+        == "Leave 12 has been marked approved."